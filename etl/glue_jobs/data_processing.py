@@ -10,20 +10,95 @@ Author: Data Engineering Team
 import sys
 from awsglue.transforms import *
 from awsglue.utils import getResolvedOptions
+from pyspark import SparkConf
 from pyspark.context import SparkContext
 from awsglue.context import GlueContext
 from awsglue.job import Job
 from awsglue.dynamicframe import DynamicFrame
+from pyspark.sql import Observation
 from pyspark.sql import functions as F
 from pyspark.sql.types import *
+from pyspark import StorageLevel
 import boto3
+import schema_registry
+from watermark_store import WatermarkStore
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import logging
+import math
+import threading
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Columns that must be populated for a record to be usable downstream
+CRITICAL_COLUMNS = {
+    'customers': ['customer_id', 'email', 'registration_date'],
+    'products': ['product_id', 'product_name', 'price'],
+    'orders': ['order_id', 'customer_id', 'order_date', 'total_amount'],
+    'order_items': ['order_item_id', 'order_id', 'product_id', 'quantity'],
+    'web_events': ['event_id', 'session_id', 'event_type', 'event_timestamp']
+}
+
+# Tables processed by this job
+PROCESSED_TABLES = ['customers', 'products', 'orders', 'order_items', 'web_events']
+
+# Tables built from another processed table rather than read from raw data
+DERIVED_FROM = {
+    'web_sessions': 'web_events'
+}
+
+# Hive-style partition columns of each processed table
+PARTITION_KEYS = {
+    'customers': [],
+    'products': [],
+    'orders': ['order_year', 'order_month'],
+    'order_items': ['order_year', 'order_month'],
+    'web_events': ['event_year', 'event_month'],
+    'web_sessions': ['session_year', 'session_month']
+}
+
+# Event types counted per session by the sessionization stage
+SESSION_EVENT_TYPES = [
+    'page_view', 'product_view', 'add_to_cart', 'remove_from_cart',
+    'checkout_start', 'purchase', 'search', 'login', 'logout'
+]
+
+# How far before the web_events watermark an incremental run looks for
+# earlier events of the sessions it sees; longer sessions are split
+SESSION_LOOKBACK_HOURS = 24
+
+# Output file sizing: Parquet is roughly a quarter of the raw in-memory estimate
+DEFAULT_TARGET_FILE_SIZE_MB = 256
+PARQUET_COMPRESSION_RATIO = 0.25
+
+# Caching: tables estimated below the limit are kept in memory only, larger
+# ones may spill to disk rather than have evicted partitions recomputed
+DEFAULT_CACHE_MEMORY_LIMIT_MB = 512
+
+# CloudWatch metric name of each collected row metric
+ROW_METRIC_NAMES = {
+    'rows_written': 'RowsWritten',
+    'duplicates_dropped': 'DuplicatesDropped'
+}
+
+# Change-tracking columns used for incremental processing, in priority order
+WATERMARK_COLUMNS = ['updated_at', 'created_at']
+
+# Job arguments that may be omitted; read with self.args.get(...)
+OPTIONAL_ARGS = [
+    'exact_key_cardinality',
+    'metrics_namespace',
+    'processing_mode',
+    'watermark_location',
+    'target_file_size_mb',
+    'table_concurrency',
+    'cache_memory_limit_mb'
+]
+
+
 class DataProcessor:
     def __init__(self, glue_context, spark_context, job, job_args=None):
         self.glueContext = glue_context
@@ -31,7 +106,21 @@ class DataProcessor:
         self.sc = spark_context
         self.job = job
         self.args = job_args or {}
-        
+        self.quality_profiles = {}
+        self.row_metrics = {}
+        self.cache_entries = {}
+        self.cache_lock = threading.Lock()
+        self.incremental = self.args.get('processing_mode', 'full') == 'incremental'
+        self.watermark_store = None
+        self.watermarks = {}
+        if self.incremental:
+            location = self.args.get(
+                'watermark_location',
+                f"s3://{self.args.get('processed_data_bucket', '')}/_state/watermarks.json"
+            )
+            self.watermark_store = WatermarkStore(location)
+            self.watermarks = self.watermark_store.load()
+
     def read_from_s3(self, database_name, table_name, transformation_ctx):
         """Read data from S3 using Glue Data Catalog"""
         try:
@@ -41,8 +130,9 @@ class DataProcessor:
                 table_name=table_name,
                 transformation_ctx=transformation_ctx
             )
-            logger.info(f"Successfully read {dynamic_frame.count()} records from {table_name}")
-            return dynamic_frame
+            logger.info(f"Successfully opened {table_name} from catalog")
+            typed_df = schema_registry.conform(dynamic_frame.toDF(), table_name)
+            return DynamicFrame.fromDF(typed_df, self.glueContext, transformation_ctx)
         except Exception as e:
             logger.error(f"Error reading from catalog {table_name}: {str(e)}")
             logger.info(f"Attempting to read directly from S3...")
@@ -52,64 +142,157 @@ class DataProcessor:
                 # Get bucket name from job arguments
                 raw_bucket = self.args.get('raw_data_bucket', '')
                 s3_path = f"s3://{raw_bucket}/data/{table_name}.csv"
-                dynamic_frame = self.glueContext.create_dynamic_frame.from_options(
-                    connection_type="s3",
-                    connection_options={"paths": [s3_path]},
-                    format="csv",
-                    format_options={"withHeader": True},
-                    transformation_ctx=transformation_ctx
-                )
-                logger.info(f"Successfully read {dynamic_frame.count()} records from S3 directly")
-                return dynamic_frame
+                typed_df = schema_registry.read_csv(self.spark, s3_path, table_name)
+                logger.info(f"Successfully opened {s3_path} from S3 directly")
+                return DynamicFrame.fromDF(typed_df, self.glueContext, transformation_ctx)
             except Exception as s3_error:
                 logger.error(f"Error reading from S3 {s3_path}: {str(s3_error)}")
                 raise
     
+    def watermark_expr(self, df):
+        """Change-tracking timestamp of each row, or None if the table has none"""
+        columns = [F.col(c).cast('timestamp') for c in WATERMARK_COLUMNS if c in df.columns]
+        if not columns:
+            return None
+        return F.coalesce(*columns) if len(columns) > 1 else columns[0]
+
+    def apply_watermark(self, df, table_name):
+        """Keep only rows newer than the table's stored watermark in incremental mode"""
+        if not self.incremental:
+            return df
+
+        expr = self.watermark_expr(df)
+        watermark = self.watermarks.get(table_name)
+        if expr is None or watermark is None:
+            logger.info(f"No watermark for {table_name}, processing full history")
+            return df
+
+        logger.info(f"Processing {table_name} rows changed after {watermark}")
+        return df.filter(expr > F.lit(watermark).cast('timestamp'))
+
+    def advance_watermarks(self):
+        """Persist the newest change timestamp seen per table once all writes succeeded"""
+        if not self.incremental:
+            return
+
+        advanced = dict(self.watermarks)
+        for table_name, profile in self.quality_profiles.items():
+            if profile.get('max_watermark'):
+                advanced[table_name] = profile['max_watermark']
+
+        if advanced != self.watermarks:
+            self.watermark_store.save(advanced)
+            self.watermarks = advanced
+
     def validate_data_quality(self, df, table_name):
-        """Perform data quality checks"""
+        """Profile a table in a single Spark job and record quality issues
+
+        Null counts for every critical column, the row count and the business
+        key cardinality are computed in one fused aggregation. The resulting
+        profile is kept on the processor so the transforms can reuse it.
+        """
         logger.info(f"Starting data quality validation for {table_name}")
-        
-        quality_issues = []
-        
-        # Check for null values in critical columns
-        critical_columns = {
-            'customers': ['customer_id', 'email', 'registration_date'],
-            'products': ['product_id', 'product_name', 'price'],
-            'orders': ['order_id', 'customer_id', 'order_date', 'total_amount'],
-            'order_items': ['order_item_id', 'order_id', 'product_id', 'quantity']
+
+        null_columns = [c for c in CRITICAL_COLUMNS.get(table_name, []) if c in df.columns]
+        key_column = schema_registry.BUSINESS_KEYS.get(table_name)
+        if key_column not in df.columns:
+            key_column = None
+
+        aggregations = [F.count(F.lit(1)).alias("row_count")]
+        aggregations += [
+            F.sum(F.when(F.col(c).isNull(), 1).otherwise(0)).alias(f"nulls_{c}")
+            for c in null_columns
+        ]
+        exact_cardinality = self.args.get('exact_key_cardinality', 'false').lower() == 'true'
+        if key_column:
+            if exact_cardinality:
+                aggregations.append(F.countDistinct(key_column).alias("distinct_keys"))
+            else:
+                aggregations.append(
+                    F.approx_count_distinct(key_column, rsd=0.01).alias("distinct_keys")
+                )
+
+        watermark = self.watermark_expr(df) if self.incremental else None
+        if watermark is not None:
+            aggregations.append(F.max(watermark).alias("max_watermark"))
+
+        stats = df.agg(*aggregations).collect()[0].asDict()
+
+        row_count = stats["row_count"]
+        null_counts = {c: stats[f"nulls_{c}"] or 0 for c in null_columns}
+        distinct_keys = stats.get("distinct_keys", row_count)
+        duplicate_count = max(row_count - distinct_keys, 0) if key_column else 0
+
+        profile = {
+            'table_name': table_name,
+            'row_count': row_count,
+            'null_counts': null_counts,
+            'key_column': key_column,
+            'distinct_keys': distinct_keys,
+            'duplicate_count': duplicate_count,
+            'cardinality_exact': exact_cardinality,
+            'max_watermark': stats['max_watermark'].isoformat() if stats.get('max_watermark') else None,
+            'issues': [],
+            'passed': True
         }
-        
-        if table_name in critical_columns:
-            for col in critical_columns[table_name]:
-                if col in df.columns:
-                    null_count = df.filter(F.col(col).isNull()).count()
-                    if null_count > 0:
-                        quality_issues.append(f"Found {null_count} null values in {col}")
-        
-        # Check for duplicate records
-        total_count = df.count()
-        if table_name == 'customers':
-            distinct_count = df.select('customer_id').distinct().count()
-        elif table_name == 'products':
-            distinct_count = df.select('product_id').distinct().count()
-        elif table_name == 'orders':
-            distinct_count = df.select('order_id').distinct().count()
-        elif table_name == 'order_items':
-            distinct_count = df.select('order_item_id').distinct().count()
-        else:
-            distinct_count = total_count
-            
-        if distinct_count != total_count:
-            quality_issues.append(f"Found {total_count - distinct_count} duplicate records")
-        
+
+        for col, null_count in null_counts.items():
+            if null_count > 0:
+                profile['issues'].append(f"Found {null_count} null values in {col}")
+
+        # Approximate cardinality is off by about 1%, so its duplicate count
+        # is reported as an estimate and does not fail the profile
+        if duplicate_count > 0 and exact_cardinality:
+            profile['issues'].append(f"Found {duplicate_count} duplicate records")
+        elif duplicate_count > 0:
+            logger.info(f"Estimated {duplicate_count} duplicate records in {table_name} (approximate)")
+
+        profile['passed'] = not profile['issues']
+        self.quality_profiles[table_name] = profile
+
         # Log quality issues
-        if quality_issues:
-            logger.warning(f"Data quality issues in {table_name}: {quality_issues}")
+        if profile['issues']:
+            logger.warning(f"Data quality issues in {table_name}: {profile['issues']}")
         else:
             logger.info(f"Data quality validation passed for {table_name}")
-        
-        return quality_issues
-    
+
+        return profile
+
+    def has_nulls(self, table_name, columns):
+        """Return False only when the table profile proves the columns have no nulls"""
+        profile = self.quality_profiles.get(table_name)
+        if profile is None:
+            return True
+        return any(profile['null_counts'].get(c, 1) > 0 for c in columns)
+
+    def deduplicate(self, df, table_name):
+        """Keep the newest row per business key, ordered by updated_at then created_at
+
+        Uses a hash aggregate on the key taking the max of a struct led by
+        the change-tracking columns, which needs no global sort. Each kept
+        row carries its version count in a _versions column through the
+        transforms; the write's observed metrics sum it into the rows
+        dropped and project it away, so counting needs no extra pass.
+        """
+        key_column = schema_registry.BUSINESS_KEYS.get(table_name)
+        if key_column not in df.columns:
+            return df
+
+        profile = self.quality_profiles.get(table_name, {})
+        if profile.get('cardinality_exact') and profile.get('duplicate_count') == 0:
+            logger.info(f"Skipping deduplication for {table_name}: no duplicate keys")
+            return df
+
+        ordering = [c for c in WATERMARK_COLUMNS if c in df.columns]
+        payload = [c for c in df.columns if c != key_column and c not in ordering]
+        latest = df.groupBy(key_column).agg(
+            F.max(F.struct(*[F.col(c) for c in ordering + payload])).alias("_latest"),
+            F.count(F.lit(1)).alias("_versions")
+        ).select(key_column, "_latest.*", "_versions")
+
+        logger.info(f"Deduplicating {table_name} on {key_column}")
+        return latest.select(*df.columns, "_versions")
+
     def transform_customers(self, customers_df):
         """Transform customer data"""
         logger.info("Transforming customer data")
@@ -132,12 +315,13 @@ class DataProcessor:
             F.current_timestamp()
         )
         
-        # Filter out invalid records
-        transformed_df = transformed_df.filter(
-            (F.col("customer_id").isNotNull()) &
-            (F.col("email").isNotNull()) &
-            (F.col("registration_date").isNotNull())
-        )
+        # Filter out invalid records, skipped when the profile found no nulls
+        if self.has_nulls('customers', CRITICAL_COLUMNS['customers']):
+            transformed_df = transformed_df.filter(
+                (F.col("customer_id").isNotNull()) &
+                (F.col("email").isNotNull()) &
+                (F.col("registration_date").isNotNull())
+            )
         
         return transformed_df
     
@@ -167,12 +351,13 @@ class DataProcessor:
         )
         
         # Filter out invalid records
-        transformed_df = transformed_df.filter(
-            (F.col("product_id").isNotNull()) &
-            (F.col("product_name").isNotNull()) &
-            (F.col("price").isNotNull()) &
-            (F.col("price") > 0)
-        )
+        if self.has_nulls('products', CRITICAL_COLUMNS['products']):
+            transformed_df = transformed_df.filter(
+                (F.col("product_id").isNotNull()) &
+                (F.col("product_name").isNotNull()) &
+                (F.col("price").isNotNull())
+            )
+        transformed_df = transformed_df.filter(F.col("price") > 0)
         
         return transformed_df
     
@@ -212,34 +397,494 @@ class DataProcessor:
         )
         
         # Filter out invalid records
+        if self.has_nulls('orders', CRITICAL_COLUMNS['orders']):
+            transformed_df = transformed_df.filter(
+                (F.col("order_id").isNotNull()) &
+                (F.col("customer_id").isNotNull()) &
+                (F.col("order_date").isNotNull()) &
+                (F.col("total_amount").isNotNull())
+            )
+        transformed_df = transformed_df.filter(F.col("total_amount") > 0)
+        
+        return transformed_df
+
+    def transform_order_items(self, order_items_df):
+        """Transform order item data"""
+        logger.info("Transforming order item data")
+
+        # Order items are created together with their order, so created_at
+        # carries the order date used for partitioning
+        transformed_df = order_items_df.withColumn(
+            "order_year",
+            F.year(F.col("created_at"))
+        ).withColumn(
+            "order_month",
+            F.month(F.col("created_at"))
+        ).withColumn(
+            "calculated_line_total",
+            (F.col("quantity") * F.col("unit_price")).cast(DecimalType(10, 2))
+        ).withColumn(
+            "is_line_total_valid",
+            F.abs(F.col("line_total") - F.col("calculated_line_total")) < 0.01
+        ).withColumn(
+            "processed_at",
+            F.current_timestamp()
+        )
+
+        # Filter out invalid records
+        if self.has_nulls('order_items', CRITICAL_COLUMNS['order_items']):
+            transformed_df = transformed_df.filter(
+                (F.col("order_item_id").isNotNull()) &
+                (F.col("order_id").isNotNull()) &
+                (F.col("product_id").isNotNull()) &
+                (F.col("quantity").isNotNull())
+            )
         transformed_df = transformed_df.filter(
-            (F.col("order_id").isNotNull()) &
-            (F.col("customer_id").isNotNull()) &
-            (F.col("order_date").isNotNull()) &
-            (F.col("total_amount").isNotNull()) &
-            (F.col("total_amount") > 0)
+            (F.col("quantity") > 0) &
+            (F.col("unit_price") >= 0)
         )
-        
+
+        return transformed_df
+
+    def transform_web_events(self, web_events_df):
+        """Transform web event data
+
+        Every step is narrow; the write repartitions on the partition keys
+        and sessionization shuffles on session_id, so no layout is imposed
+        here.
+        """
+        logger.info("Transforming web event data")
+
+        transformed_df = web_events_df.withColumn(
+            "event_date",
+            F.to_date(F.col("event_timestamp"))
+        ).withColumn(
+            "event_date_key",
+            F.date_format(F.col("event_date"), "yyyyMMdd").cast(IntegerType())
+        ).withColumn(
+            "event_year",
+            F.year(F.col("event_date"))
+        ).withColumn(
+            "event_month",
+            F.month(F.col("event_date"))
+        ).withColumn(
+            "event_quarter",
+            F.quarter(F.col("event_date"))
+        ).withColumn(
+            "event_day_of_week",
+            F.dayofweek(F.col("event_date"))
+        ).withColumn(
+            "event_hour",
+            F.hour(F.col("event_timestamp"))
+        ).withColumn(
+            "is_conversion_event",
+            F.col("event_type").isin(schema_registry.CONVERSION_EVENT_TYPES)
+        ).withColumn(
+            "is_purchase_event",
+            F.col("event_type").isin(schema_registry.PURCHASE_EVENT_TYPES)
+        ).withColumn(
+            "processed_at",
+            F.current_timestamp()
+        )
+
+        # Filter out invalid records
+        if self.has_nulls('web_events', CRITICAL_COLUMNS['web_events']):
+            transformed_df = transformed_df.filter(
+                (F.col("event_id").isNotNull()) &
+                (F.col("session_id").isNotNull()) &
+                (F.col("event_type").isNotNull()) &
+                (F.col("event_timestamp").isNotNull())
+            )
+
         return transformed_df
 
-    def write_to_s3(self, dynamic_frame, output_path, format_type="parquet"):
-        """Write data to S3"""
+    def session_events(self, web_events_df):
+        """Every event of the sessions in web_events_df, including earlier runs' events
+
+        In incremental mode a session can span two runs, so its processed
+        events from SESSION_LOOKBACK_HOURS before the watermark are merged
+        back in and the session is appended again as a newer version.
+        """
+        watermark = self.watermarks.get('web_events')
+        if not self.incremental or watermark is None:
+            return web_events_df
+
+        lookback = datetime.fromisoformat(watermark) - timedelta(hours=SESSION_LOOKBACK_HOURS)
+        logger.info(f"Merging earlier events of open sessions from {lookback.isoformat()}")
+        columns = [
+            "event_id", "session_id", "customer_id", "event_timestamp", "event_type",
+            "is_purchase_event", "page_url", "device_type"
+        ]
+        earlier = self.spark.read.parquet(
+            f"s3://{self.args['processed_data_bucket']}/web_events/"
+        ).filter(
+            (F.col("event_year") * 100 + F.col("event_month") >= lookback.year * 100 + lookback.month) &
+            (F.col("event_timestamp") >= F.lit(lookback.isoformat()).cast('timestamp'))
+        ).join(
+            web_events_df.select("session_id").distinct(), "session_id", "left_semi"
+        )
+        return earlier.select(columns) \
+            .unionByName(web_events_df.select(columns)) \
+            .dropDuplicates(["event_id"])
+
+    def build_web_sessions(self, web_events_df):
+        """Aggregate transformed web events into one row per session
+
+        Event type counts use conditional sums over a fixed list rather than
+        a pivot, and entry/exit pages come from the min/max of a
+        (timestamp, page) struct, so the whole stage is a single aggregation.
+        """
+        logger.info("Building web sessions")
+        web_events_df = self.session_events(web_events_df)
+
+        first_event = F.min(F.struct(F.col("event_timestamp"), F.col("page_url")))
+        last_event = F.max(F.struct(F.col("event_timestamp"), F.col("page_url")))
+
+        sessions_df = web_events_df.groupBy("session_id").agg(
+            F.first("customer_id", ignorenulls=True).alias("customer_id"),
+            F.min("event_timestamp").alias("session_start"),
+            F.max("event_timestamp").alias("session_end"),
+            F.count(F.lit(1)).alias("event_count"),
+            *[
+                F.sum(F.when(F.col("event_type") == event_type, 1).otherwise(0)).alias(f"{event_type}_count")
+                for event_type in SESSION_EVENT_TYPES
+            ],
+            F.max(F.col("is_purchase_event").cast(IntegerType())).alias("purchase_flag"),
+            first_event.getField("page_url").alias("entry_page"),
+            last_event.getField("page_url").alias("exit_page"),
+            F.first("device_type", ignorenulls=True).alias("device_type")
+        )
+
+        return sessions_df.withColumn(
+            "session_duration_seconds",
+            F.unix_timestamp("session_end") - F.unix_timestamp("session_start")
+        ).withColumn(
+            "converted_to_purchase",
+            F.col("purchase_flag") == 1
+        ).withColumn(
+            "session_date_key",
+            F.date_format(F.col("session_start"), "yyyyMMdd").cast(IntegerType())
+        ).withColumn(
+            "session_year",
+            F.year(F.col("session_start"))
+        ).withColumn(
+            "session_month",
+            F.month(F.col("session_start"))
+        ).withColumn(
+            "processed_at",
+            F.current_timestamp()
+        ).drop("purchase_flag")
+
+    def register_consumers(self, df, table_name, consumers):
+        """Persist a DataFrame that more than one consumer will read
+
+        The storage level follows the estimated size: small tables are kept
+        in memory only, larger ones spill to disk. The table is unpersisted
+        when the last registered consumer releases it.
+        """
+        if len(consumers) < 2:
+            return df
+
+        limit_mb = int(self.args.get('cache_memory_limit_mb', DEFAULT_CACHE_MEMORY_LIMIT_MB))
+        estimated_bytes = self.estimate_plan_bytes(df)
+        if estimated_bytes is not None and estimated_bytes <= limit_mb * 1024 * 1024:
+            storage_level = StorageLevel.MEMORY_ONLY
+        else:
+            storage_level = StorageLevel.MEMORY_AND_DISK
+
+        cached_df = df.persist(storage_level)
+        with self.cache_lock:
+            self.cache_entries[table_name] = {
+                'df': cached_df,
+                'pending': set(consumers),
+                'materialized': False,
+                'storage_level': storage_level
+            }
+        logger.info(
+            f"Caching {table_name} for {sorted(consumers)} at {storage_level} "
+            f"(estimated {(estimated_bytes or 0) / 1024 / 1024:.1f} MB)"
+        )
+        return cached_df
+
+    def cached_bytes(self, df):
+        """Bytes actually held by the cache for a persisted DataFrame"""
         try:
-            self.glueContext.write_dynamic_frame.from_options(
-                frame=dynamic_frame,
-                connection_type="s3",
-                connection_options={
-                    "path": output_path,
-                    "partitionKeys": []
-                },
-                format=format_type,
-                transformation_ctx=f"write_{format_type}"
+            cache_manager = self.spark._jsparkSession.sharedState().cacheManager()
+            cached = cache_manager.lookupCachedData(df._jdf)
+            if cached.isEmpty():
+                return 0
+            return int(cached.get().cachedRepresentation().cacheBuilder().sizeInBytesStats().value())
+        except Exception as e:
+            logger.warning(f"Could not read cached size: {str(e)}")
+            return None
+
+    @contextmanager
+    def cached_use(self, table_name, consumer):
+        """Scope one consumer's use of a cached table, releasing it afterwards"""
+        entry = self.cache_entries.get(table_name)
+        if entry is None:
+            yield
+            return
+
+        logger.info(
+            f"Cache {'hit' if entry['materialized'] else 'miss'} for {table_name} ({consumer})"
+        )
+        try:
+            yield
+        finally:
+            with self.cache_lock:
+                entry['materialized'] = True
+                entry['pending'].discard(consumer)
+                last_consumer = not entry['pending']
+                if last_consumer:
+                    del self.cache_entries[table_name]
+            if last_consumer:
+                logger.info(f"Releasing cache for {table_name}: {self.cached_bytes(entry['df'])} bytes cached")
+                entry['df'].unpersist()
+
+    def track_row_count(self, df, table_name):
+        """Attach a row count that Spark collects while the DataFrame is written
+
+        The count is an observed metric: a count aggregated inside the write
+        on the JVM side and reported when the write action completes, so no
+        extra action, S3 read or Python round trip is needed. Rows kept by
+        deduplicate also sum their _versions into the duplicates dropped
+        among the written rows, and the column is projected away.
+        """
+        observation = Observation(f"{table_name}_rows")
+        self.row_metrics[table_name] = observation
+        aggregations = [F.count(F.lit(1)).alias("rows_written")]
+        if "_versions" in df.columns:
+            aggregations.append(
+                F.coalesce(F.sum(F.col("_versions") - 1), F.lit(0)).alias("duplicates_dropped")
             )
-            logger.info(f"Successfully wrote data to {output_path}")
+        return df.observe(observation, *aggregations).drop("_versions")
+
+    def collect_row_metrics(self):
+        """Flatten the collected row metrics into (table, metric, value) triples"""
+        return [
+            (table_name, name, value)
+            for table_name, observation in self.row_metrics.items()
+            for name, value in observation.get.items()
+        ]
+
+    def report_row_metrics(self):
+        """Log collected row counts once and optionally publish them to CloudWatch
+
+        Observed metrics are only available once their write completed, so
+        this runs after every table was written.
+        """
+        metrics = self.collect_row_metrics()
+        for table_name, name, value in metrics:
+            logger.info(f"Row metric {table_name} {name}: {value}")
+
+        namespace = self.args.get('metrics_namespace')
+        if namespace and metrics:
+            try:
+                boto3.client('cloudwatch').put_metric_data(
+                    Namespace=namespace,
+                    MetricData=[
+                        {
+                            'MetricName': ROW_METRIC_NAMES[name],
+                            'Dimensions': [{'Name': 'Table', 'Value': table_name}],
+                            'Value': value,
+                            'Unit': 'Count'
+                        }
+                        for table_name, name, value in metrics
+                    ]
+                )
+            except Exception as e:
+                logger.warning(f"Could not publish row metrics: {str(e)}")
+
+        return metrics
+
+    def estimate_plan_bytes(self, df):
+        """Size of a DataFrame according to the optimizer's plan statistics"""
+        try:
+            return int(str(df._jdf.queryExecution().optimizedPlan().stats().sizeInBytes()))
+        except Exception as e:
+            logger.warning(f"Could not estimate plan size: {str(e)}")
+            return None
+
+    def estimate_output_bytes(self, df):
+        """Estimate the Parquet output size from the optimizer's plan statistics"""
+        plan_bytes = self.estimate_plan_bytes(df)
+        return int(plan_bytes * PARQUET_COMPRESSION_RATIO) if plan_bytes is not None else None
+
+    def estimate_row_count(self, df, table_name):
+        """Rows a table will write: the profiled source count, else the plan's estimate"""
+        profile = self.quality_profiles.get(table_name)
+        if profile is not None:
+            return profile['row_count']
+        try:
+            row_count = df._jdf.queryExecution().optimizedPlan().stats().rowCount()
+            return int(str(row_count.get())) if row_count.isDefined() else None
+        except Exception as e:
+            logger.warning(f"Could not estimate row count: {str(e)}")
+            return None
+
+    def size_for_write(self, df, table_name):
+        """Lay a table out so each output file lands near the target size
+
+        Returns the DataFrame to write and the maxRecordsPerFile to write it
+        with (None for no cap). Partitioned tables are range partitioned
+        into one task per target-sized file on their partition keys and a
+        hash of the row key, so a large Hive partition is split across
+        several tasks while small ones share a task; the record cap bounds
+        any file that still outgrows the target.
+        """
+        target_mb = int(self.args.get('target_file_size_mb', DEFAULT_TARGET_FILE_SIZE_MB))
+        estimated_bytes = self.estimate_output_bytes(df)
+        if estimated_bytes is None:
+            return df, None
+
+        target_bytes = target_mb * 1024 * 1024
+        num_files = max(1, math.ceil(estimated_bytes / target_bytes))
+        row_count = self.estimate_row_count(df, table_name)
+        max_records = None
+        if row_count:
+            max_records = max(1, math.ceil(row_count * target_bytes / max(estimated_bytes, 1)))
+
+        partition_keys = PARTITION_KEYS.get(table_name, [])
+        logger.info(
+            f"Writing {table_name} as ~{num_files} file(s) of up to {max_records or 'any'} rows "
+            f"(estimated {estimated_bytes / 1024 / 1024:.1f} MB, target {target_mb} MB)"
+        )
+
+        if partition_keys:
+            key_column = schema_registry.BUSINESS_KEYS.get(table_name)
+            salt = F.xxhash64(*[F.col(c) for c in ([key_column] if key_column in df.columns else df.columns)])
+            return df.repartitionByRange(
+                num_files, *[F.col(c) for c in partition_keys], salt
+            ), max_records
+        if num_files < df.rdd.getNumPartitions():
+            return df.coalesce(num_files), max_records
+        return df.repartition(num_files), max_records
+
+    def write_to_s3(self, df, output_path, format_type="parquet", partition_keys=None,
+                    max_records_per_file=None, mode="append"):
+        """Write data to S3, Hive-partitioned on partition_keys when given
+
+        Uses Spark's own writer, which runs as a SQL action, so metrics
+        observed on df are reported when the write completes. Tasks start a
+        new file after max_records_per_file rows when it is given. An
+        overwrite of a partitioned table replaces only the partitions df
+        has rows for.
+        """
+        try:
+            writer = df.write.mode(mode).format(format_type) \
+                .option("partitionOverwriteMode", "dynamic")
+            if max_records_per_file:
+                writer = writer.option("maxRecordsPerFile", max_records_per_file)
+            writer.partitionBy(*(partition_keys or [])).save(output_path)
+            logger.info(f"Successfully wrote data to {output_path} partitioned by {partition_keys or []}")
         except Exception as e:
             logger.error(f"Error writing to {output_path}: {str(e)}")
             raise
 
+    def write_processed(self, df, table_name):
+        """Size, count and write a processed table to the processed bucket
+
+        A full run replaces the table; an incremental run appends its
+        changed rows as new versions, which readers deduplicate.
+        """
+        df, max_records = self.size_for_write(df, table_name)
+        df = self.track_row_count(df, table_name)
+
+        self.write_to_s3(
+            df,
+            f"s3://{self.args['processed_data_bucket']}/{table_name}/",
+            "parquet",
+            PARTITION_KEYS.get(table_name, []),
+            max_records,
+            mode="append" if self.incremental else "overwrite"
+        )
+
+    def process_table(self, table_name):
+        """Run read, validate, transform and write for a single table"""
+        transformers = {
+            'customers': self.transform_customers,
+            'products': self.transform_products,
+            'orders': self.transform_orders,
+            'order_items': self.transform_order_items,
+            'web_events': self.transform_web_events
+        }
+        derived_tables = {
+            'web_sessions': self.build_web_sessions
+        }
+        started = datetime.utcnow()
+
+        df = self.read_from_s3(
+            self.args['database_name'],
+            table_name,
+            f'read_{table_name}'
+        ).toDF()
+
+        # Restrict to rows changed since the last run in incremental mode
+        df = self.apply_watermark(df, table_name)
+
+        # Validation and the transform both scan the source, so read it once
+        df = self.register_consumers(df, table_name, ['validate', 'transform'])
+
+        with self.cached_use(table_name, 'validate'):
+            self.validate_data_quality(df, table_name)
+
+        with self.cached_use(table_name, 'transform'):
+            transformed = transformers[table_name](self.deduplicate(df, table_name))
+
+            derived = {
+                name: builder for name, builder in derived_tables.items()
+                if DERIVED_FROM[name] == table_name
+            }
+
+            # The processed table and any derived tables scan the same result
+            cache_name = f"{table_name}_transformed"
+            transformed = self.register_consumers(
+                transformed, cache_name, [table_name] + list(derived)
+            )
+            with self.cached_use(cache_name, table_name):
+                self.write_processed(transformed, table_name)
+            for name, builder in derived.items():
+                with self.cached_use(cache_name, name):
+                    self.write_processed(builder(transformed), name)
+
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        logger.info(f"Processed {table_name} in {elapsed:.1f}s")
+
+    def run_pipelines(self, table_names):
+        """Process tables sequentially, or concurrently in separate FAIR pools
+
+        With --table_concurrency above 1 each table's pipeline is submitted
+        from a thread pool and tagged with its own scheduler pool, so small
+        tables run alongside the large ones instead of waiting for them.
+        """
+        concurrency = int(self.args.get('table_concurrency', 1))
+        if concurrency <= 1:
+            for table_name in table_names:
+                self.process_table(table_name)
+            return
+
+        def run_in_pool(table_name):
+            self.sc.setLocalProperty('spark.scheduler.pool', f'{table_name}_pool')
+            try:
+                self.process_table(table_name)
+            finally:
+                self.sc.setLocalProperty('spark.scheduler.pool', None)
+
+        logger.info(f"Processing {len(table_names)} tables with concurrency {concurrency}")
+        failures = []
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(run_in_pool, t): t for t in table_names}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Pipeline for {futures[future]} failed: {str(e)}")
+                    failures.append(futures[future])
+
+        if failures:
+            raise RuntimeError(f"Table pipelines failed: {failures}")
+
     def write_to_redshift(self, dynamic_frame, table_name, redshift_connection):
         """Write data to Redshift"""
         try:
@@ -267,9 +912,13 @@ def main():
         'processed_data_bucket',
         'database_name'
     ])
+    args.update(schema_registry.get_optional_args(sys.argv, OPTIONAL_ARGS))
 
-    # Initialize Glue context
-    sc = SparkContext()
+    # Initialize Glue context; FAIR scheduling lets concurrent table pipelines share executors
+    conf = SparkConf()
+    if int(args.get('table_concurrency', 1)) > 1:
+        conf.set('spark.scheduler.mode', 'FAIR')
+    sc = SparkContext(conf=conf)
     glueContext = GlueContext(sc)
     spark = glueContext.spark_session
     job = Job(glueContext)
@@ -281,68 +930,10 @@ def main():
     try:
         logger.info("Starting ETL job")
 
-        # Read raw data
-        customers_df = processor.read_from_s3(
-            args['database_name'],
-            'customers',
-            'read_customers'
-        ).toDF()
+        processor.run_pipelines(PROCESSED_TABLES)
 
-        products_df = processor.read_from_s3(
-            args['database_name'],
-            'products',
-            'read_products'
-        ).toDF()
-
-        orders_df = processor.read_from_s3(
-            args['database_name'],
-            'orders',
-            'read_orders'
-        ).toDF()
-
-        # Validate data quality
-        processor.validate_data_quality(customers_df, 'customers')
-        processor.validate_data_quality(products_df, 'products')
-        processor.validate_data_quality(orders_df, 'orders')
-
-        # Transform data
-        customers_transformed = processor.transform_customers(customers_df)
-        products_transformed = processor.transform_products(products_df)
-        orders_transformed = processor.transform_orders(orders_df)
-
-        # Convert back to DynamicFrames
-        customers_dynamic = DynamicFrame.fromDF(
-            customers_transformed,
-            glueContext,
-            "customers_transformed"
-        )
-        products_dynamic = DynamicFrame.fromDF(
-            products_transformed,
-            glueContext,
-            "products_transformed"
-        )
-        orders_dynamic = DynamicFrame.fromDF(
-            orders_transformed,
-            glueContext,
-            "orders_transformed"
-        )
-
-        # Write processed data to S3
-        processor.write_to_s3(
-            customers_dynamic,
-            f"s3://{args['processed_data_bucket']}/customers/",
-            "parquet"
-        )
-        processor.write_to_s3(
-            products_dynamic,
-            f"s3://{args['processed_data_bucket']}/products/",
-            "parquet"
-        )
-        processor.write_to_s3(
-            orders_dynamic,
-            f"s3://{args['processed_data_bucket']}/orders/",
-            "parquet"
-        )
+        processor.report_row_metrics()
+        processor.advance_watermarks()
 
         logger.info("ETL job completed successfully")
 
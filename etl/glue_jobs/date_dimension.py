@@ -0,0 +1,137 @@
+"""
+Date Dimension Builder
+
+Generates rows of dimensions.dim_date for any span of years with pandas
+date ranges. Every attribute is computed as a whole-column operation, so
+decades of dates are built in one pass, with calendar, fiscal and holiday
+attributes matching sql/ddl/create_dimension_tables.sql.
+
+Author: Data Engineering Team
+"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+
+# dim_date columns with their Spark SQL types, in table order
+COLUMNS = [
+    ('date_key', 'INT'),
+    ('date_actual', 'DATE'),
+    ('day_of_week', 'INT'),
+    ('day_of_week_name', 'STRING'),
+    ('day_of_month', 'INT'),
+    ('day_of_year', 'INT'),
+    ('week_of_year', 'INT'),
+    ('month_number', 'INT'),
+    ('month_name', 'STRING'),
+    ('month_abbrev', 'STRING'),
+    ('quarter_number', 'INT'),
+    ('quarter_name', 'STRING'),
+    ('year_number', 'INT'),
+    ('is_weekend', 'BOOLEAN'),
+    ('is_holiday', 'BOOLEAN'),
+    ('holiday_name', 'STRING'),
+    ('fiscal_year', 'INT'),
+    ('fiscal_quarter', 'INT'),
+    ('fiscal_month', 'INT'),
+    ('is_business_day', 'BOOLEAN'),
+    ('business_day_of_month', 'INT'),
+    ('business_day_of_year', 'INT'),
+]
+
+# The fiscal year starts in April and is named after the calendar year it starts in
+FISCAL_YEAR_START_MONTH = 4
+
+# National holidays that fall on the same date every year, (month, day) -> name.
+# Lunar-calendar holidays move from year to year and are passed in as extra_holidays.
+FIXED_HOLIDAYS = {
+    (1, 26): 'Republic Day',
+    (8, 15): 'Independence Day',
+    (10, 2): 'Gandhi Jayanti',
+    (12, 25): 'Christmas Day',
+}
+
+
+def build_date_dimension(start_date, end_date, extra_holidays=None,
+                         fiscal_year_start_month=FISCAL_YEAR_START_MONTH):
+    """Build dim_date rows for every date from start_date to end_date inclusive
+
+    The business day counters run over whole months and years, so the
+    frame is computed for complete calendar years and then cut to the
+    requested range. extra_holidays maps dates to holiday names on top of
+    FIXED_HOLIDAYS. Returns a pandas DataFrame with the COLUMNS of dim_date.
+    """
+    start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    dates = pd.Series(pd.date_range(
+        date(start_date.year, 1, 1), date(end_date.year, 12, 31), freq='D'
+    ))
+
+    month = dates.dt.month.to_numpy()
+    day = dates.dt.day.to_numpy()
+    year = dates.dt.year.to_numpy()
+    # pandas counts weekdays from Monday = 0; dim_date counts from Sunday = 1
+    weekday = dates.dt.dayofweek.to_numpy()
+    day_of_week = (weekday + 1) % 7 + 1
+    is_weekend = weekday >= 5
+
+    fixed = {m * 100 + d: name for (m, d), name in FIXED_HOLIDAYS.items()}
+    holiday_name = pd.Series(month * 100 + day).map(fixed)
+    if extra_holidays:
+        extra = {pd.Timestamp(d): name for d, name in extra_holidays.items()}
+        holiday_name = dates.map(extra).fillna(holiday_name)
+    is_holiday = holiday_name.notna().to_numpy()
+
+    fiscal_month = (month - fiscal_year_start_month) % 12 + 1
+    is_business_day = ~is_weekend & ~is_holiday
+    business_days = pd.Series(is_business_day.astype(np.int32))
+    quarter = dates.dt.quarter.to_numpy()
+
+    frame = pd.DataFrame({
+        'date_key': (year * 10000 + month * 100 + day).astype(np.int32),
+        'date_actual': dates.dt.date,
+        'day_of_week': day_of_week.astype(np.int32),
+        'day_of_week_name': dates.dt.day_name(),
+        'day_of_month': day.astype(np.int32),
+        'day_of_year': dates.dt.dayofyear.to_numpy().astype(np.int32),
+        'week_of_year': dates.dt.isocalendar().week.to_numpy().astype(np.int32),
+        'month_number': month.astype(np.int32),
+        'month_name': dates.dt.month_name(),
+        'month_abbrev': dates.dt.strftime('%b'),
+        'quarter_number': quarter.astype(np.int32),
+        'quarter_name': 'Q' + pd.Series(quarter).astype(str),
+        'year_number': year.astype(np.int32),
+        'is_weekend': is_weekend,
+        'is_holiday': is_holiday,
+        'holiday_name': holiday_name.astype(object).where(holiday_name.notna(), None),
+        'fiscal_year': (year - (month < fiscal_year_start_month)).astype(np.int32),
+        'fiscal_quarter': ((fiscal_month - 1) // 3 + 1).astype(np.int32),
+        'fiscal_month': fiscal_month.astype(np.int32),
+        'is_business_day': is_business_day,
+        # Business days elapsed up to and including the date
+        'business_day_of_month': business_days.groupby([year, month]).cumsum().astype(np.int32),
+        'business_day_of_year': business_days.groupby(year).cumsum().astype(np.int32),
+    })
+
+    in_range = ((dates >= start_date) & (dates <= end_date)).to_numpy()
+    return frame[in_range][[column for column, _ in COLUMNS]].reset_index(drop=True)
+
+
+def missing_ranges(existing_min, existing_max, required_start, required_end):
+    """Date ranges of [required_start, required_end] not yet covered by dim_date
+
+    dim_date is kept contiguous, so only the stretches before its first and
+    after its last date can be missing.
+    """
+    required_start, required_end = pd.Timestamp(required_start), pd.Timestamp(required_end)
+    if existing_min is None:
+        return [(required_start, required_end)]
+    existing_min, existing_max = pd.Timestamp(existing_min), pd.Timestamp(existing_max)
+
+    ranges = []
+    if required_start < existing_min:
+        ranges.append((required_start, existing_min - pd.Timedelta(days=1)))
+    if required_end > existing_max:
+        ranges.append((existing_max + pd.Timedelta(days=1), required_end))
+    return ranges
@@ -0,0 +1,698 @@
+"""
+Redshift Load Planning
+
+The pure parts of the Redshift loader: the SQL statements it runs for the
+dimensional model, fact loads and sales summaries, and the maintenance
+and materialized view refresh plans it derives from table statistics and
+the tables a batch changed. Nothing here touches Spark or a connection,
+so the loader's decisions can be tested and replayed on their own.
+
+Author: Data Engineering Team
+"""
+
+from graphlib import TopologicalSorter
+import re
+
+
+# Stands in for NULL in SCD2 row hashes, so a NULL and an empty string differ
+HASH_NULL_TOKEN = '<NULL>'
+
+# SCD Type 2 dimensions: dimension column -> staging expression, the
+# attributes whose changes create a new version, Type 1 attributes that
+# are overwritten on the current row instead, attributes recomputed on
+# every current row each batch because they move with the calendar, and
+# the staged fact source whose unknown business keys get inferred members
+# (column -> aggregate)
+SCD2_DIMENSIONS = {
+    'dim_customer': {
+        'source': 'staging.stg_customers',
+        'business_key': 'customer_id',
+        'surrogate_key': 'customer_key',
+        'columns': [
+            ('customer_id', 'customer_id'),
+            ('first_name', 'first_name'),
+            ('last_name', 'last_name'),
+            # Derived columns arrive from the processed layer; full_name falls back for raw CSV
+            ('full_name', "COALESCE(full_name, first_name || ' ' || last_name)"),
+            ('age', 'age'),
+            ('email', 'email'),
+            ('phone', 'phone'),
+            ('date_of_birth', 'date_of_birth'),
+            ('gender', 'gender'),
+            ('address_line1', 'address_line1'),
+            ('city', 'city'),
+            ('state', 'state'),
+            ('postal_code', 'postal_code'),
+            ('country', 'country'),
+            ('customer_segment', 'customer_segment'),
+            ('email_domain', 'email_domain'),
+            ('registration_date', 'registration_date'),
+            ('customer_lifetime_months', 'customer_lifetime_months'),
+            ('is_active', 'is_active')
+        ],
+        'tracked': [
+            'first_name', 'last_name', 'email', 'phone', 'date_of_birth', 'gender',
+            'address_line1', 'city', 'state', 'postal_code', 'country',
+            'customer_segment', 'is_active'
+        ],
+        'type1': [],
+        # As in data_processing.transform_customers, but as of the load date
+        'refreshed': [
+            ('age', 'FLOOR(DATEDIFF(day, date_of_birth, CURRENT_DATE) / 365.25)'),
+            ('customer_lifetime_months', 'FLOOR(DATEDIFF(day, registration_date, CURRENT_DATE) / 30)')
+        ],
+        'inferred': {
+            'source': 'staging.stg_orders',
+            'columns': []
+        }
+    },
+    'dim_product': {
+        'source': 'staging.stg_products',
+        'business_key': 'product_id',
+        'surrogate_key': 'product_key',
+        'columns': [
+            ('product_id', 'product_id'),
+            ('product_name', 'product_name'),
+            ('category_id', 'category_id'),
+            ('category_name', 'category_name'),
+            ('subcategory_name', 'subcategory_name'),
+            ('brand', 'brand'),
+            ('sku', 'sku'),
+            ('price', 'price'),
+            ('cost', 'cost'),
+            ('profit_margin', 'profit_margin'),
+            ('price_category', 'price_category'),
+            ('weight', 'weight'),
+            ('color', 'color'),
+            ('size', 'size'),
+            ('material', 'material'),
+            ('stock_quantity', 'stock_quantity'),
+            ('stock_status', 'stock_status'),
+            ('is_active', 'is_active'),
+            ('launch_date', 'launch_date')
+        ],
+        'tracked': [
+            'product_name', 'category_id', 'category_name', 'subcategory_name',
+            'brand', 'sku', 'price', 'cost', 'weight', 'color', 'size', 'material',
+            'is_active', 'launch_date'
+        ],
+        # Stock moves daily; versioning on it would multiply dimension rows
+        'type1': ['stock_quantity', 'stock_status'],
+        'inferred': {
+            'source': 'staging.stg_order_items',
+            'columns': [('product_name', 'MAX(product_name)'), ('sku', 'MAX(sku)')]
+        }
+    }
+}
+
+# fact_sales columns derived from the order: taken as computed by the
+# processing job from the processed layer, otherwise looked up on the
+# order's dim_date row or derived here from raw staging
+ORDER_DERIVED_COLUMNS = [
+    ('order_year', 'dd.year_number'),
+    ('order_month', 'dd.month_number'),
+    ('order_quarter', 'dd.quarter_number'),
+    ('order_day_of_week', 'dd.day_of_week'),
+    ('is_weekend_order', 'dd.is_weekend'),
+    ('days_to_ship', 'DATEDIFF(day, o.order_date::date, o.shipped_date::date)'),
+    ('days_to_deliver', 'DATEDIFF(day, o.order_date::date, o.delivered_date::date)')
+]
+
+# Targets published with ALTER TABLE APPEND: columns the target fills itself
+# (IDENTITY and GETDATE() defaults), left out of the shadow table
+APPEND_TARGETS = {
+    'facts.fact_sales': ['sales_key', 'created_at', 'updated_at']
+}
+
+# Percentages from svv_table_info above which a table is maintained
+MAINTENANCE_THRESHOLDS = {'stats_off': 10.0, 'unsorted': 10.0, 'deleted': 10.0}
+
+# Rough MB processed per second, used to fit maintenance into its time budget
+MAINTENANCE_MB_PER_SECOND = {'ANALYZE': 200.0, 'VACUUM SORT ONLY': 20.0, 'VACUUM DELETE ONLY': 40.0}
+
+# Materialized views from sql/views/materialized_views.sql: the tables they
+# read and the materialized views they are built on, if any
+MATERIALIZED_VIEWS = {
+    'analytics.mv_customer_360': {
+        'base_tables': ['dimensions.dim_customer', 'facts.fact_sales', 'dimensions.dim_date'],
+        'depends_on': []
+    },
+    'analytics.mv_product_performance': {
+        'base_tables': ['dimensions.dim_product', 'facts.fact_sales'],
+        'depends_on': []
+    },
+    'analytics.mv_geographic_sales': {
+        'base_tables': ['dimensions.dim_customer', 'facts.fact_sales'],
+        'depends_on': []
+    },
+    'analytics.mv_customer_cohorts': {
+        'base_tables': ['dimensions.dim_customer', 'facts.fact_sales', 'dimensions.dim_date'],
+        'depends_on': []
+    }
+}
+
+# Statements that modify a permanent table, capturing the schema-qualified table
+MODIFYING_STATEMENT = re.compile(
+    r'^(?:(?:INSERT INTO|UPDATE|DELETE FROM|COPY)\s+(\w+\.\w+)|ALTER TABLE\s+(\w+\.\w+)\s+APPEND\b)',
+    re.IGNORECASE
+)
+
+
+def plan_maintenance(table_stats, budget_seconds, thresholds=MAINTENANCE_THRESHOLDS):
+    """Decide the ANALYZE and VACUUM work for tables from their svv_table_info rows
+
+    Each row needs table_name, size_mb, tbl_rows, estimated_visible_rows,
+    unsorted and stats_off. A table gets ANALYZE when its statistics are
+    stale, and at most one VACUUM: SORT ONLY when its unsorted share is too
+    high, otherwise DELETE ONLY when too many rows are deleted but not yet
+    reclaimed. ANALYZE is cheap and goes first; vacuums follow, the largest
+    expected gain first. Actions whose estimated time no longer fits the
+    budget are returned as 'deferred' rather than dropped.
+    """
+    candidates = []
+    for stats in table_stats:
+        size_mb = float(stats.get('size_mb') or 0)
+        tbl_rows = float(stats.get('tbl_rows') or 0)
+        visible_rows = float(stats.get('estimated_visible_rows') or 0)
+        unsorted = float(stats.get('unsorted') or 0)
+        stats_off = float(stats.get('stats_off') or 0)
+        deleted = 100.0 * (tbl_rows - visible_rows) / tbl_rows if tbl_rows else 0.0
+
+        if stats_off >= thresholds['stats_off']:
+            candidates.append((0, size_mb, {
+                'table_name': stats['table_name'],
+                'action': 'ANALYZE',
+                'reason': f"stats_off {stats_off:.1f}%",
+                'estimated_seconds': size_mb / MAINTENANCE_MB_PER_SECOND['ANALYZE']
+            }))
+
+        if unsorted >= thresholds['unsorted']:
+            action, reason, work_mb = 'VACUUM SORT ONLY', f"unsorted {unsorted:.1f}%", size_mb * unsorted / 100
+        elif deleted >= thresholds['deleted']:
+            action, reason, work_mb = 'VACUUM DELETE ONLY', f"deleted {deleted:.1f}%", size_mb
+        else:
+            continue
+        candidates.append((1, -work_mb, {
+            'table_name': stats['table_name'],
+            'action': action,
+            'reason': reason,
+            'estimated_seconds': work_mb / MAINTENANCE_MB_PER_SECOND[action]
+        }))
+
+    plan = []
+    remaining = budget_seconds
+    for _, _, action in sorted(candidates, key=lambda c: (c[0], c[1])):
+        action['estimated_seconds'] = round(max(1.0, action['estimated_seconds']), 1)
+        if action['estimated_seconds'] <= remaining:
+            action['status'] = 'planned'
+            remaining -= action['estimated_seconds']
+        else:
+            action['status'] = 'deferred'
+        plan.append(action)
+    return plan
+
+
+def maintenance_log_statement(plan, batch_id):
+    """Record a batch's maintenance actions"""
+    rows = ',\n            '.join(
+        f"('{batch_id}', '{a['table_name']}', '{a['action']}', '{a['reason']}', "
+        f"'{a['status']}', {a['estimated_seconds']}, "
+        f"{'NULL' if a['elapsed_seconds'] is None else a['elapsed_seconds']})"
+        for a in plan
+    )
+    return f"""
+        INSERT INTO etl_control.maintenance_log (
+            etl_batch_id, table_name, action, reason, status, estimated_seconds, elapsed_seconds
+        )
+        VALUES
+            {rows};
+        """
+
+
+def modified_tables(results):
+    """Permanent tables that executed statements modified
+
+    Statements that report no affected rows leave their table unchanged;
+    COPY and ALTER TABLE APPEND may report -1, so they count as changes.
+    """
+    tables = set()
+    for result in results:
+        match = MODIFYING_STATEMENT.match(result['statement'])
+        if match is not None and result['rows_affected'] != 0:
+            tables.add((match.group(1) or match.group(2)).lower())
+    return tables
+
+
+def stale_materialized_views(changed_tables, views=MATERIALIZED_VIEWS):
+    """Materialized views to refresh in dependency order
+
+    A view is stale when one of its base tables is in changed_tables or a
+    materialized view it is built on is itself stale.
+    """
+    stale = {
+        name for name, config in views.items()
+        if set(changed_tables).intersection(config['base_tables'])
+    }
+    grew = True
+    while grew:
+        dependents = {
+            name for name, config in views.items()
+            if name not in stale and stale.intersection(config['depends_on'])
+        }
+        stale |= dependents
+        grew = bool(dependents)
+
+    graph = {name: set(views[name]['depends_on']) & stale for name in stale}
+    return list(TopologicalSorter(graph).static_order())
+
+
+def scd2_statements(dimension, effective_ts, batch_id, boolean_columns=()):
+    """Build the set-based SCD Type 2 statements for one dimension
+
+    Only keys whose hash over the tracked attributes is new or changed are
+    versioned. Inferred members are enriched in place instead, and logged
+    so the sales summaries built on the placeholder get rebuilt.
+    boolean_columns names the staging columns of type BOOLEAN.
+    """
+    config = SCD2_DIMENSIONS[dimension]
+    key = config['business_key']
+    target = f"dimensions.{dimension}"
+    src = f"scd_{dimension}_src"
+    changes = f"scd_{dimension}_changes"
+    columns = [column for column, _ in config['columns']]
+
+    select_list = ',\n            '.join(
+        expr if expr == column else f"{expr} AS {column}"
+        for column, expr in config['columns']
+    )
+    # Redshift cannot cast BOOLEAN to VARCHAR, so booleans are spelled out
+    hash_input = " || '|' || ".join(
+        f"COALESCE(CASE WHEN {column} THEN 't' WHEN NOT {column} THEN 'f' END, '{HASH_NULL_TOKEN}')"
+        if dict(config['columns'])[column] in boolean_columns
+        else f"COALESCE(CAST({column} AS VARCHAR), '{HASH_NULL_TOKEN}')"
+        for column in config['tracked']
+    )
+    column_list = ', '.join(columns)
+    enrich_list = ',\n            '.join(f"{column} = c.{column}" for column in columns if column != key)
+
+    statements = [
+        f"DROP TABLE IF EXISTS {src};",
+        f"""
+        CREATE TEMP TABLE {src} AS
+        SELECT *, MD5({hash_input}) AS row_hash
+        FROM (
+            SELECT
+            {select_list}
+            FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY updated_at DESC) AS version_rank
+                FROM {config['source']}
+            ) ranked
+            WHERE version_rank = 1
+        ) latest;
+        """,
+        f"DROP TABLE IF EXISTS {changes};",
+        f"""
+        CREATE TEMP TABLE {changes} AS
+        SELECT s.*, (d.{key} IS NOT NULL) AS has_current_row,
+               COALESCE(d.is_inferred, false) AS enriches_inferred
+        FROM {src} s
+        LEFT JOIN {target} d ON d.{key} = s.{key} AND d.is_current = true
+        WHERE d.{key} IS NULL OR d.row_hash IS NULL OR d.row_hash <> s.row_hash;
+        """,
+        f"""
+        UPDATE {target}
+        SET expiry_date = '{effective_ts}'::timestamp,
+            is_current = false,
+            updated_at = '{effective_ts}'::timestamp
+        FROM {changes} c
+        WHERE {target}.{key} = c.{key}
+          AND {target}.is_current = true
+          AND c.has_current_row
+          AND NOT c.enriches_inferred;
+        """,
+        f"""
+        INSERT INTO {target} (
+            {column_list}, row_hash, effective_date, is_current
+        )
+        SELECT {column_list}, row_hash, '{effective_ts}'::timestamp, true
+        FROM {changes}
+        WHERE NOT enriches_inferred;
+        """,
+        f"""
+        INSERT INTO etl_control.inferred_member_log (etl_batch_id, dimension, member_key)
+        SELECT '{batch_id}', '{dimension}', {target}.{config['surrogate_key']}
+        FROM {target}
+        JOIN {changes} c ON {target}.{key} = c.{key}
+        WHERE {target}.is_current = true
+          AND c.enriches_inferred;
+        """,
+        f"""
+        UPDATE {target}
+        SET {enrich_list},
+            row_hash = c.row_hash,
+            is_inferred = false,
+            updated_at = '{effective_ts}'::timestamp
+        FROM {changes} c
+        WHERE {target}.{key} = c.{key}
+          AND {target}.is_current = true
+          AND c.enriches_inferred;
+        """
+    ]
+
+    # Type 1 attributes are overwritten in place on the current row
+    if config.get('type1'):
+        assignments = ', '.join(f"{column} = s.{column}" for column in config['type1'])
+        # Redshift has no IS DISTINCT FROM, so spell out the null-safe comparison
+        differs = ' OR '.join(
+            f"{target}.{column} <> s.{column} "
+            f"OR ({target}.{column} IS NULL) <> (s.{column} IS NULL)"
+            for column in config['type1']
+        )
+        statements.append(f"""
+        UPDATE {target}
+        SET {assignments}, updated_at = '{effective_ts}'::timestamp
+        FROM {src} s
+        WHERE {target}.{key} = s.{key}
+          AND {target}.is_current = true
+          AND ({differs});
+        """)
+
+    # Ages and tenures are kept current on customers no batch restages
+    if config.get('refreshed'):
+        assignments = ',\n            '.join(f"{column} = {expr}" for column, expr in config['refreshed'])
+        differs = ' OR '.join(
+            f"{column} <> {expr} OR ({column} IS NULL) <> ({expr} IS NULL)"
+            for column, expr in config['refreshed']
+        )
+        statements.append(f"""
+        UPDATE {target}
+        SET {assignments},
+            updated_at = '{effective_ts}'::timestamp
+        WHERE is_current = true
+          AND ({differs});
+        """)
+
+    return statements
+
+
+def inferred_member_statement(dimension, effective_ts):
+    """Insert placeholder rows for business keys staged facts reference but the dimension lacks
+
+    Late-arriving dimension records would otherwise make the fact joins
+    drop their rows. Inferred members carry what the fact source knows,
+    have no row_hash and are flagged is_inferred until the real record
+    arrives and scd2_statements enriches them.
+    """
+    config = SCD2_DIMENSIONS[dimension]
+    key = config['business_key']
+    target = f"dimensions.{dimension}"
+    inferred = config['inferred']
+    columns = [key] + [column for column, _ in inferred['columns']]
+    select_list = ', '.join([f"s.{key}"] + [expr for _, expr in inferred['columns']])
+
+    return f"""
+        INSERT INTO {target} (
+            {', '.join(columns)}, effective_date, is_current, is_inferred
+        )
+        SELECT {select_list}, '{effective_ts}'::timestamp, true, true
+        FROM {inferred['source']} s
+        WHERE s.{key} IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM {target} d
+              WHERE d.{key} = s.{key} AND d.is_current = true
+          )
+        GROUP BY s.{key};
+        """
+
+
+def dimension_statements(effective_ts, batch_id, boolean_columns=None):
+    """SCD Type 2 statements for every dimension, in load order
+
+    Inferred members are added after every dimension has taken this
+    batch's real records, and before any fact is joined to them.
+    boolean_columns maps each dimension to its staging BOOLEAN columns.
+    """
+    boolean_columns = boolean_columns or {}
+    statements = []
+    for dimension in SCD2_DIMENSIONS:
+        statements.extend(scd2_statements(
+            dimension, effective_ts, batch_id, boolean_columns.get(dimension, ())
+        ))
+    for dimension in SCD2_DIMENSIONS:
+        statements.append(inferred_member_statement(dimension, effective_ts))
+    return statements
+
+
+def fact_load_log_statement(table_name, date_key_column, strategy, min_key, max_key, batch_id):
+    """Record a batch's load of a fact table, counting only its date window"""
+    return f"""
+        INSERT INTO etl_control.fact_load_log (
+            table_name, etl_batch_id, load_strategy, min_date_key, max_date_key, rows_loaded
+        )
+        SELECT '{table_name}', '{batch_id}', '{strategy}', {min_key}, {max_key}, COUNT(*)
+        FROM {table_name}
+        WHERE {date_key_column} BETWEEN {min_key} AND {max_key}
+          AND etl_batch_id = '{batch_id}';
+        """
+
+
+def fact_sales_statements(strategy, min_key, max_key, batch_id, source_layer, target='facts.fact_sales'):
+    """Statements that load staged order items into fact_sales for the batch's date window
+
+    The window is on order_date_key, the leading SORTKEY column, so zone
+    maps skip blocks outside the batch. 'append' inserts only rows not
+    already present; 'restate' deletes and reinserts the staged orders.
+    """
+    window = f"BETWEEN {min_key} AND {max_key}"
+    order_date_key = "dd.date_key"
+    derived_columns = ', '.join(column for column, _ in ORDER_DERIVED_COLUMNS)
+    derived_select = ',\n        '.join(
+        f"o.{column}" if source_layer == 'processed' else f"{expr} as {column}"
+        for column, expr in ORDER_DERIVED_COLUMNS
+    )
+
+    statements = []
+    if strategy == 'restate':
+        statements.append(f"""
+        DELETE FROM facts.fact_sales
+        WHERE order_date_key {window}
+          AND order_id IN (SELECT order_id FROM staging.stg_orders);
+        """)
+        existing_filter = ""
+    else:
+        existing_filter = f"""
+        AND NOT EXISTS (
+            SELECT 1 FROM facts.fact_sales fs
+            WHERE fs.order_date_key {window}
+              AND fs.order_date_key = {order_date_key}
+              AND fs.order_id = oi.order_id
+              AND fs.order_item_id = oi.order_item_id
+        )"""
+
+    # Sales fact transformation
+    statements.append(f"""
+    INSERT INTO {target} (
+        order_date_key, customer_key, product_key,
+        order_id, order_item_id, sku, quantity, unit_price, line_total,
+        order_subtotal, order_tax_amount, order_shipping_cost,
+        order_discount_amount, order_total_amount,
+        order_status, payment_method, shipping_method, order_source,
+        {derived_columns}, etl_batch_id
+    )
+    SELECT
+        {order_date_key} as order_date_key,
+        dc.customer_key,
+        dp.product_key,
+        oi.order_id,
+        oi.order_item_id,
+        oi.sku,
+        oi.quantity,
+        oi.unit_price,
+        oi.line_total,
+        o.subtotal,
+        o.tax_amount,
+        o.shipping_cost,
+        o.discount_amount,
+        o.total_amount,
+        o.order_status,
+        o.payment_method,
+        o.shipping_method,
+        o.order_source,
+        {derived_select},
+        '{batch_id}' as etl_batch_id
+    FROM staging.stg_order_items oi
+    JOIN staging.stg_orders o ON oi.order_id = o.order_id
+    JOIN dimensions.dim_date dd ON dd.date_actual = o.order_date::date
+    JOIN dimensions.dim_customer dc ON o.customer_id = dc.customer_id AND dc.is_current = true
+    JOIN dimensions.dim_product dp ON oi.product_id = dp.product_id AND dp.is_current = true
+    WHERE 1 = 1{existing_filter};
+    """)
+
+    return statements
+
+
+def sales_aggregate_statements(batch_id, min_key=None, max_key=None):
+    """Statements that re-aggregate the sales summary facts this batch affected
+
+    Days and whole months in the window are rebuilt, plus any day with
+    facts on an inferred member this batch enriched. Daily rows carry HLL
+    sketches because distinct counts cannot be summed across days.
+    """
+    enriched_days = "sales_aggregate_enriched_days"
+
+    def touched(expr, window, enriched_expr, enriched_select):
+        enriched = f"{enriched_expr} IN (SELECT {enriched_select} FROM {enriched_days})"
+        if min_key is None:
+            return enriched
+        return f"({expr} BETWEEN {window[0]} AND {window[1]} OR {enriched})"
+
+    # Whole months: from the first of min_key's month to the last of max_key's
+    day_window = (min_key, max_key)
+    month_window = month_day_window = None
+    if min_key is not None:
+        month_window = (min_key // 100, max_key // 100)
+        month_day_window = (min_key // 100 * 100 + 1, max_key // 100 * 100 + 31)
+
+    day_filter = touched("order_date_key", day_window, "order_date_key", "order_date_key")
+    fact_day_filter = touched("fs.order_date_key", day_window, "fs.order_date_key", "order_date_key")
+    month_filter = touched("month_key", month_window, "month_key", "order_date_key / 100")
+    fact_month_filter = touched(
+        "fs.order_date_key", month_day_window, "fs.order_date_key / 100", "order_date_key / 100"
+    )
+
+    return [
+        f"DROP TABLE IF EXISTS {enriched_days};",
+        f"""
+        CREATE TEMP TABLE {enriched_days} AS
+        SELECT DISTINCT fs.order_date_key
+        FROM facts.fact_sales fs
+        JOIN etl_control.inferred_member_log l
+          ON l.etl_batch_id = '{batch_id}'
+         AND ((l.dimension = 'dim_customer' AND fs.customer_key = l.member_key)
+           OR (l.dimension = 'dim_product' AND fs.product_key = l.member_key));
+        """,
+        f"DELETE FROM facts.fact_sales_daily WHERE {day_filter};",
+        f"""
+        INSERT INTO facts.fact_sales_daily (
+            order_date_key, product_key, category_name,
+            line_count, order_count, total_units_sold, total_revenue, unit_price_sum,
+            customer_sketch, order_sketch, etl_batch_id
+        )
+        SELECT
+            fs.order_date_key,
+            fs.product_key,
+            dp.category_name,
+            COUNT(*),
+            COUNT(DISTINCT fs.order_id),
+            SUM(fs.quantity),
+            SUM(fs.line_total),
+            SUM(fs.unit_price),
+            HLL_CREATE_SKETCH(fs.customer_key),
+            HLL_CREATE_SKETCH(fs.order_id),
+            '{batch_id}'
+        FROM facts.fact_sales fs
+        JOIN dimensions.dim_product dp ON fs.product_key = dp.product_key
+        WHERE {fact_day_filter}
+        GROUP BY fs.order_date_key, fs.product_key, dp.category_name;
+        """,
+        f"DELETE FROM facts.fact_sales_monthly WHERE {month_filter};",
+        f"""
+        INSERT INTO facts.fact_sales_monthly (
+            month_key, year_number, month_number, month_name, quarter_number,
+            state, city, customer_segment,
+            line_count, order_count, customer_count,
+            total_units_sold, total_revenue, etl_batch_id
+        )
+        SELECT
+            dd.year_number * 100 + dd.month_number,
+            dd.year_number,
+            dd.month_number,
+            dd.month_name,
+            dd.quarter_number,
+            dc.state,
+            dc.city,
+            dc.customer_segment,
+            COUNT(*),
+            COUNT(DISTINCT fs.order_id),
+            COUNT(DISTINCT fs.customer_key),
+            SUM(fs.quantity),
+            SUM(fs.order_total_amount),
+            '{batch_id}'
+        FROM facts.fact_sales fs
+        JOIN dimensions.dim_date dd ON fs.order_date_key = dd.date_key
+        JOIN dimensions.dim_customer dc ON fs.customer_key = dc.customer_key
+        WHERE {fact_month_filter}
+        GROUP BY
+            dd.year_number, dd.month_number, dd.month_name, dd.quarter_number,
+            dc.state, dc.city, dc.customer_segment;
+        """
+    ]
+
+
+def source_load_log_statement(processed_windows, batch_id):
+    """Record the processed_at each source table was staged through, None if nothing new was"""
+    rows = ',\n            '.join(
+        f"('{table_name}', '{batch_id}', '{through}')"
+        for table_name, (after, through) in sorted(processed_windows.items())
+        if through is not None and through != after
+    )
+    if not rows:
+        return None
+    return f"""
+        INSERT INTO etl_control.source_load_log (table_name, etl_batch_id, processed_through)
+        VALUES
+            {rows};
+        """
+
+
+def shadow_table(target):
+    """Name of the shadow table a target's new rows are built in"""
+    return f"staging.shadow_{target.split('.')[-1]}"
+
+
+def shadow_table_statements(target):
+    """(Re)create an empty shadow table laid out like target
+
+    LIKE keeps the target's column encodings, DISTKEY and SORTKEY, which
+    ALTER TABLE APPEND requires. Columns the target fills itself are
+    dropped so APPEND ... FILLTARGET generates them on the target.
+    """
+    shadow = shadow_table(target)
+    statements = [
+        f"DROP TABLE IF EXISTS {shadow};",
+        f"CREATE TABLE {shadow} (LIKE {target});"
+    ]
+    statements.extend(
+        f"ALTER TABLE {shadow} DROP COLUMN {column};" for column in APPEND_TARGETS[target]
+    )
+    return statements
+
+
+def fact_publish_statements(publish_mode, strategy, min_key, max_key, batch_id, source_layer):
+    """Fact statements of a published batch: (in its transaction, after the APPEND)
+
+    min_key is None when there are no facts to load; the summaries built
+    on inferred members the batch enriched are still rebuilt. In append
+    mode the rows go to the shadow table, and the summaries and log row
+    follow the APPEND, which cannot run in a transaction.
+    """
+    if min_key is None:
+        return sales_aggregate_statements(batch_id), []
+
+    log_statement = fact_load_log_statement(
+        'facts.fact_sales', 'order_date_key', strategy, min_key, max_key, batch_id
+    )
+    if publish_mode == 'append':
+        shadow = shadow_table('facts.fact_sales')
+        return (
+            shadow_table_statements('facts.fact_sales') +
+            fact_sales_statements(strategy, min_key, max_key, batch_id, source_layer, target=shadow),
+            sales_aggregate_statements(batch_id, min_key, max_key) +
+            [log_statement, f"DROP TABLE IF EXISTS {shadow};"]
+        )
+    return (
+        fact_sales_statements(strategy, min_key, max_key, batch_id, source_layer) +
+        sales_aggregate_statements(batch_id, min_key, max_key) +
+        [log_statement],
+        []
+    )
@@ -10,17 +10,69 @@ Author: Data Engineering Team
 import sys
 from awsglue.transforms import *
 from awsglue.utils import getResolvedOptions
+from pyspark import StorageLevel
 from pyspark.context import SparkContext
 from awsglue.context import GlueContext
 from awsglue.job import Job
 from awsglue.dynamicframe import DynamicFrame
 from pyspark.sql import functions as F
+from pyspark.sql.types import BooleanType, DecimalType, IntegerType, StructField, StructType
+import schema_registry
+import date_dimension
+import load_planning
+from redshift_connection import RedshiftConnectionPool
+import boto3
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from datetime import datetime
+import json
 import logging
+import threading
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Job arguments that may be omitted; read with self.args.get(...)
+OPTIONAL_ARGS = [
+    'redshift_dsn',
+    'max_connections',
+    'temp_bucket',
+    'load_mode',
+    'redshift_iam_role',
+    'copy_file_count',
+    'etl_batch_id',
+    'staging_concurrency',
+    'fact_load_strategy',
+    'fact_key_resolution',
+    'publish_mode',
+    'source_layer',
+    'processed_data_bucket',
+    'maintenance_budget_seconds',
+    'inventory_snapshot_date',
+    'inventory_snapshot_mode'
+]
+
+# Staging tables loaded before the dimensional model is built
+STAGING_TABLES = ['stg_customers', 'stg_products', 'stg_orders', 'stg_order_items']
+
+# Parquet files written per bulk-loaded table; keep a multiple of the cluster's slice count
+DEFAULT_COPY_FILE_COUNT = 8
+
+# Calendar years dim_date is kept ahead of the latest staged order and today
+DATE_DIMENSION_YEARS_AHEAD = 2
+
+# Tables maintained after each load, in svv_table_info "schema.table" form
+MAINTENANCE_TABLES = [
+    'facts.fact_sales', 'facts.fact_sales_daily', 'facts.fact_sales_monthly',
+    'facts.fact_web_events', 'facts.fact_inventory',
+    'dimensions.dim_customer', 'dimensions.dim_product'
+]
+
+DEFAULT_MAINTENANCE_BUDGET_SECONDS = 600
+
+
+
 class RedshiftLoader:
     def __init__(self, glue_context, spark_context, job, job_args):
         self.glueContext = glue_context
@@ -28,22 +80,24 @@ class RedshiftLoader:
         self.sc = spark_context
         self.job = job
         self.args = job_args
-        
+        self.pool = None
+        # Permanent tables modified in this run, for materialized view refreshes
+        self.changed_tables = set()
+        self.source_layer = self.args.get('source_layer', 'raw')
+        # Source table -> (after, through] processed_at window staged in this run
+        self.processed_windows = {}
+        self.batch_id = self.args.get('etl_batch_id') or datetime.utcnow().strftime('%Y%m%d%H%M%S')
+
     def load_to_redshift_staging(self, s3_path, table_name, redshift_connection):
         """Load data from S3 to Redshift staging table"""
         try:
             logger.info(f"Loading data from {s3_path} to {table_name}")
             
-            # Read data from S3
-            dynamic_frame = self.glueContext.create_dynamic_frame.from_options(
-                connection_type="s3",
-                connection_options={"paths": [s3_path]},
-                format="csv",
-                format_options={"withHeader": True},
-                transformation_ctx=f"read_{table_name}"
+            # Read data from S3 with the registered schema, so columns arrive typed
+            typed_df = self.read_typed(
+                s3_path, table_name, self.processed_window(table_name, redshift_connection)
             )
-            
-            logger.info(f"Read {dynamic_frame.count()} records from S3")
+            dynamic_frame = DynamicFrame.fromDF(typed_df, self.glueContext, f"read_{table_name}")
             
             # Write to Redshift
             self.glueContext.write_dynamic_frame.from_jdbc_conf(
@@ -64,148 +118,881 @@ class RedshiftLoader:
             logger.error(f"Error loading {table_name}: {str(e)}")
             raise
     
+    def list_parquet_files(self, s3_prefix):
+        """List the Parquet objects under an S3 prefix with their sizes"""
+        bucket, prefix = s3_prefix[5:].split('/', 1)
+        paginator = boto3.client('s3').get_paginator('list_objects_v2')
+        files = []
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                if obj['Key'].endswith('.parquet'):
+                    files.append((f"s3://{bucket}/{obj['Key']}", obj['Size']))
+        return files
+
+    def write_manifest(self, files, manifest_url):
+        """Write a COPY manifest listing exactly the given files"""
+        manifest = {
+            'entries': [
+                {'url': url, 'mandatory': True, 'meta': {'content_length': size}}
+                for url, size in files
+            ]
+        }
+        bucket, key = manifest_url[5:].split('/', 1)
+        boto3.client('s3').put_object(
+            Bucket=bucket, Key=key, Body=json.dumps(manifest).encode('utf-8')
+        )
+        return manifest_url
+
+    def bulk_load(self, df, target_table, redshift_connection, truncate=False,
+                  sort_columns=None, pre_statements=None, post_statements=None):
+        """Bulk load a DataFrame into a Redshift table with COPY from Parquet
+
+        The DataFrame is written as Parquet under a batch-specific prefix, a
+        manifest lists exactly those files, and a single COPY loads them so
+        every slice reads files in parallel. Columns are matched by name via
+        an explicit column list. With sort_columns the files are range
+        partitioned and sorted so rows arrive in sort key order. Pre and post
+        statements run in the same transaction as the COPY.
+        """
+        temp_root = f"s3://{self.args.get('temp_bucket', '')}/bulk-load/{self.batch_id}"
+        data_prefix = f"{temp_root}/{target_table}/"
+        file_count = int(self.args.get('copy_file_count', DEFAULT_COPY_FILE_COUNT))
+
+        if sort_columns:
+            df = df.repartitionByRange(file_count, *sort_columns).sortWithinPartitions(*sort_columns)
+        else:
+            df = df.repartition(file_count)
+        df.write.mode('overwrite').parquet(data_prefix)
+
+        files = self.list_parquet_files(data_prefix)
+        if not files:
+            logger.info(f"No files to load into {target_table}")
+            return []
+        manifest_url = self.write_manifest(files, f"{temp_root}/{target_table}.manifest")
+
+        if truncate:
+            # TRUNCATE commits implicitly in Redshift, so it runs on its own
+            self.execute_sql(f"TRUNCATE TABLE {target_table};", redshift_connection)
+
+        iam_role = self.args.get('redshift_iam_role')
+        copy_sql = f"""
+            COPY {target_table} ({', '.join(df.columns)})
+            FROM '{manifest_url}'
+            IAM_ROLE {f"'{iam_role}'" if iam_role else 'default'}
+            FORMAT AS PARQUET
+            MANIFEST;
+        """
+        logger.info(f"Copying {len(files)} Parquet file(s) into {target_table}")
+        statements = (pre_statements or []) + [copy_sql] + (post_statements or [])
+        return self.execute_statements(statements, redshift_connection)
+
+    def copy_to_redshift_staging(self, s3_path, table_name, redshift_connection):
+        """Load data from S3 to a Redshift staging table with COPY from Parquet"""
+        try:
+            logger.info(f"Bulk loading data from {s3_path} to {table_name}")
+
+            typed_df = self.read_typed(
+                s3_path, table_name, self.processed_window(table_name, redshift_connection)
+            )
+            staged_df = typed_df.withColumn('etl_batch_id', F.lit(self.batch_id))
+
+            self.bulk_load(staged_df, f"staging.{table_name}", redshift_connection, truncate=True)
+
+            logger.info(f"Successfully loaded data to staging.{table_name}")
+
+        except Exception as e:
+            logger.error(f"Error loading {table_name}: {str(e)}")
+            raise
+
+    def load_staging_tables(self, tables, load_staging, redshift_connection):
+        """Load independent staging tables concurrently and return per-table timings
+
+        At most --staging_concurrency loads run at once so Redshift WLM
+        concurrency is respected. The first failure cancels the loads that
+        have not started and the Spark jobs of those still running; the
+        error is then re-raised so no dimension or fact work begins.
+        """
+        concurrency = max(1, int(self.args.get('staging_concurrency', 2)))
+        cancelled = threading.Event()
+        timings = {}
+
+        def run(table):
+            if cancelled.is_set():
+                raise RuntimeError(f"Load of {table} cancelled")
+            self.sc.setJobGroup(f"load_{table}", f"Staging load for {table}", interruptOnCancel=True)
+            started = time.monotonic()
+            s3_path = self.source_path(table.replace('stg_', ''))
+            load_staging(s3_path, table, redshift_connection)
+            timings[table] = round(time.monotonic() - started, 1)
+            logger.info(f"Loaded {table} in {timings[table]}s")
+
+        logger.info(f"Loading {len(tables)} staging tables with concurrency {concurrency}")
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(run, table): table for table in tables}
+            done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+
+            failed = [f for f in done if f.exception() is not None]
+            if failed:
+                cancelled.set()
+                for future in pending:
+                    future.cancel()
+                for table in tables:
+                    self.sc.cancelJobGroup(f"load_{table}")
+                wait(pending)
+                error = failed[0].exception()
+                logger.error(f"Staging load of {futures[failed[0]]} failed: {str(error)}")
+                raise error
+
+        logger.info(f"Staging load timings: {timings}")
+        return timings
+
+    def dimension_statements(self, effective_ts):
+        """SCD Type 2 statements for every dimension, in load order"""
+        boolean_columns = {
+            dimension: {
+                field.name
+                for field in schema_registry.get_schema(config['source'].split('.')[-1]).fields
+                if isinstance(field.dataType, BooleanType)
+            }
+            for dimension, config in load_planning.SCD2_DIMENSIONS.items()
+        }
+        return load_planning.dimension_statements(effective_ts, self.batch_id, boolean_columns)
+
     def transform_to_dimensions(self, redshift_connection):
-        """Transform staging data to dimension tables"""
+        """Transform staging data to SCD Type 2 dimension tables"""
         try:
             logger.info("Transforming data to dimension tables")
-            
-            # Customer dimension transformation
-            customer_sql = """
-            INSERT INTO dimensions.dim_customer (
-                customer_id, first_name, last_name, full_name, email, phone,
-                date_of_birth, gender, address_line1, city, state, postal_code,
-                country, customer_segment, registration_date, is_active,
-                effective_date, is_current
-            )
-            SELECT DISTINCT
-                customer_id,
-                first_name,
-                last_name,
-                first_name || ' ' || last_name as full_name,
-                email,
-                phone,
-                date_of_birth::date,
-                gender,
-                address_line1,
-                city,
-                state,
-                postal_code,
-                country,
-                customer_segment,
-                registration_date::timestamp,
-                is_active::boolean,
-                CURRENT_TIMESTAMP as effective_date,
-                true as is_current
-            FROM staging.stg_customers
-            WHERE customer_id NOT IN (SELECT DISTINCT customer_id FROM dimensions.dim_customer WHERE is_current = true);
-            """
-            
-            # Product dimension transformation
-            product_sql = """
-            INSERT INTO dimensions.dim_product (
-                product_id, product_name, category_id, category_name, subcategory_name,
-                brand, sku, price, cost, weight, color, size, material,
-                stock_quantity, is_active, launch_date, effective_date, is_current
-            )
-            SELECT DISTINCT
-                product_id,
-                product_name,
-                category_id,
-                category_name,
-                subcategory_name,
-                brand,
-                sku,
-                price::decimal(10,2),
-                cost::decimal(10,2),
-                weight::decimal(8,2),
-                color,
-                size,
-                material,
-                stock_quantity::integer,
-                is_active::boolean,
-                launch_date::date,
-                CURRENT_TIMESTAMP as effective_date,
-                true as is_current
-            FROM staging.stg_products
-            WHERE product_id NOT IN (SELECT DISTINCT product_id FROM dimensions.dim_product WHERE is_current = true);
-            """
-            
-            # Execute transformations
-            self.execute_sql(customer_sql, redshift_connection)
-            self.execute_sql(product_sql, redshift_connection)
-            
-            logger.info("Dimension transformations completed")
-            
+
+            effective_ts = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+            statements = self.dimension_statements(effective_ts)
+
+            # Both dimensions change together or not at all
+            results = self.execute_statements(statements, redshift_connection)
+            inserted = [r['rows_affected'] for r in results if r['statement'].startswith('INSERT')]
+            logger.info(f"Dimension transformations completed, rows inserted per statement: {inserted}")
+
         except Exception as e:
             logger.error(f"Error in dimension transformation: {str(e)}")
             raise
     
-    def transform_to_facts(self, redshift_connection):
-        """Transform staging data to fact tables"""
+    def extend_date_dimension(self, redshift_connection):
+        """Add the dim_date rows the staged orders and coming years need
+
+        dim_date must cover every staged order date, because facts join it
+        for their date keys, and DATE_DIMENSION_YEARS_AHEAD calendar years
+        past the later of the latest order and today. Only dates outside
+        the existing range are built, in whole-column pandas operations,
+        and they are bulk loaded in date_key order.
+        """
         try:
-            logger.info("Transforming data to fact tables")
-            
-            # Sales fact transformation
-            sales_fact_sql = """
-            INSERT INTO facts.fact_sales (
-                order_date_key, customer_key, product_key,
-                order_id, order_item_id, sku, quantity, unit_price, line_total,
-                order_subtotal, order_tax_amount, order_shipping_cost, 
-                order_discount_amount, order_total_amount,
-                order_status, payment_method, shipping_method, order_source,
-                order_year, order_month, order_quarter
+            pool = self.get_pool(redshift_connection)
+            existing = pool.query(
+                "SELECT MIN(date_actual) AS min_date, MAX(date_actual) AS max_date FROM dimensions.dim_date"
+            )[0]
+            staged = pool.query(
+                "SELECT MIN(order_date)::date AS min_date, MAX(order_date)::date AS max_date FROM staging.stg_orders"
+            )[0]
+
+            today = datetime.utcnow().date()
+            first = min(staged['min_date'] or today, today)
+            last = max(staged['max_date'] or today, today)
+            ranges = date_dimension.missing_ranges(
+                existing['min_date'], existing['max_date'],
+                datetime(first.year, 1, 1), datetime(last.year + DATE_DIMENSION_YEARS_AHEAD, 12, 31)
             )
-            SELECT 
-                CAST(TO_CHAR(o.order_date::date, 'YYYYMMDD') AS INTEGER) as order_date_key,
-                dc.customer_key,
-                dp.product_key,
-                oi.order_id,
-                oi.order_item_id,
-                oi.sku,
-                oi.quantity::integer,
-                oi.unit_price::decimal(10,2),
-                oi.line_total::decimal(10,2),
-                o.subtotal::decimal(10,2),
-                o.tax_amount::decimal(10,2),
-                o.shipping_cost::decimal(10,2),
-                o.discount_amount::decimal(10,2),
-                o.total_amount::decimal(10,2),
-                o.order_status,
-                o.payment_method,
-                o.shipping_method,
-                o.order_source,
-                EXTRACT(YEAR FROM o.order_date::date) as order_year,
-                EXTRACT(MONTH FROM o.order_date::date) as order_month,
-                EXTRACT(QUARTER FROM o.order_date::date) as order_quarter
-            FROM staging.stg_order_items oi
-            JOIN staging.stg_orders o ON oi.order_id = o.order_id
-            JOIN dimensions.dim_customer dc ON o.customer_id = dc.customer_id AND dc.is_current = true
-            JOIN dimensions.dim_product dp ON oi.product_id = dp.product_id AND dp.is_current = true
-            WHERE NOT EXISTS (
-                SELECT 1 FROM facts.fact_sales fs 
-                WHERE fs.order_id = oi.order_id AND fs.order_item_id = oi.order_item_id
-            );
-            """
-            
-            self.execute_sql(sales_fact_sql, redshift_connection)
-            
+            if not ranges:
+                logger.info(f"dim_date already covers {existing['min_date']} to {existing['max_date']}")
+                return
+
+            schema = ', '.join(f"{column} {dtype}" for column, dtype in date_dimension.COLUMNS)
+            dates_df = None
+            for start, end in ranges:
+                logger.info(f"Extending dim_date with {start.date()} to {end.date()}")
+                frame = self.spark.createDataFrame(
+                    date_dimension.build_date_dimension(start, end), schema=schema
+                )
+                dates_df = frame if dates_df is None else dates_df.unionByName(frame)
+
+            self.bulk_load(dates_df, 'dimensions.dim_date', redshift_connection, sort_columns=['date_key'])
+
+        except Exception as e:
+            logger.error(f"Error extending date dimension: {str(e)}")
+            raise
+
+    def get_batch_date_window(self, redshift_connection):
+        """Return the (min, max) order_date_key of the orders in staging"""
+        rows = self.get_pool(redshift_connection).query("""
+            SELECT
+                CAST(TO_CHAR(MIN(order_date)::date, 'YYYYMMDD') AS INTEGER) AS min_date_key,
+                CAST(TO_CHAR(MAX(order_date)::date, 'YYYYMMDD') AS INTEGER) AS max_date_key
+            FROM staging.stg_orders
+        """)
+        return rows[0]['min_date_key'], rows[0]['max_date_key']
+
+    def is_batch_loaded(self, table_name, redshift_connection):
+        """Whether this batch was already recorded as loaded into a fact table"""
+        rows = self.get_pool(redshift_connection).query(
+            "SELECT 1 FROM etl_control.fact_load_log WHERE table_name = %s AND etl_batch_id = %s",
+            (table_name, self.batch_id)
+        )
+        return bool(rows)
+
+    def append_from_shadow(self, target, redshift_connection):
+        """Move the shadow table's blocks into target without copying them
+
+        Redshift runs ALTER TABLE APPEND outside any transaction block and
+        commits it on its own, so all of the shadow's rows become visible
+        in target at once.
+        """
+        return self.execute_statements(
+            [f"ALTER TABLE {target} APPEND FROM {load_planning.shadow_table(target)} FILLTARGET;"],
+            redshift_connection,
+            transaction=False
+        )
+
+    def publish_batch(self, redshift_connection):
+        """Publish this batch's dimension versions and fact_sales rows
+
+        Everything runs in one transaction, except that with
+        --publish_mode=append the facts are built in a shadow table and
+        moved in with ALTER TABLE APPEND, which commits on its own, so the
+        summaries and log row follow it. Append mode rejects the 'restate'
+        strategy, whose DELETE would show before its replacement rows.
+        """
+        try:
+            logger.info(f"Publishing batch {self.batch_id}")
+
+            effective_ts = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+            statements = self.dimension_statements(effective_ts)
+
+            publish_mode = self.args.get('publish_mode', 'transaction')
+            strategy = self.args.get('fact_load_strategy', 'append')
+            if publish_mode == 'append' and strategy != 'append':
+                raise ValueError(
+                    f"publish_mode=append does not support fact_load_strategy={strategy}"
+                )
+
+            min_key, max_key = self.get_batch_date_window(redshift_connection)
+            if self.is_batch_loaded('facts.fact_sales', redshift_connection):
+                logger.info(f"Batch {self.batch_id} already loaded into facts.fact_sales, skipping facts")
+                min_key = max_key = None
+            elif min_key is None:
+                logger.info("No staged orders to load")
+            else:
+                logger.info(
+                    f"Loading fact_sales for order_date_key BETWEEN {min_key} AND {max_key} "
+                    f"using {strategy}, publish mode {publish_mode}"
+                )
+
+            fact_statements, after_append = load_planning.fact_publish_statements(
+                publish_mode, strategy, min_key, max_key, self.batch_id, self.source_layer
+            )
+
+            # One batch transaction: dimensions and facts commit together
+            self.execute_statements(statements + fact_statements, redshift_connection)
+
+            if after_append:
+                self.append_from_shadow('facts.fact_sales', redshift_connection)
+                self.execute_statements(after_append, redshift_connection)
+
+            logger.info(f"Batch {self.batch_id} published")
+
+        except Exception as e:
+            logger.error(f"Error publishing batch: {str(e)}")
+            raise
+
+    def source_path(self, table_name):
+        """S3 location of a source table in the configured --source_layer"""
+        if self.source_layer == 'processed':
+            return f"s3://{self.args['processed_data_bucket']}/{table_name}/"
+        return f"s3://{self.args['raw_data_bucket']}/data/{table_name}.csv"
+
+    def read_typed(self, s3_path, table_name, window=(None, None)):
+        """Read a source table with its registered schema
+
+        The processed layer is Parquet already cleaned by data_processing.py
+        and carries its derived columns, so nothing is parsed or recomputed;
+        window limits it to rows processed in (after, through]. The raw
+        layer is the CSV export.
+        """
+        if self.source_layer == 'processed':
+            return schema_registry.read_processed(self.spark, s3_path, table_name, *window)
+        return schema_registry.read_csv(self.spark, s3_path, table_name)
+
+    def read_source(self, table_name, window=(None, None)):
+        """Read a source table for Spark-side fact building"""
+        return self.read_typed(self.source_path(table_name), table_name, window)
+
+    def processed_window(self, table_name, redshift_connection):
+        """The (after, through] processed_at window of a table's rows staged in this run
+
+        after is where the last recorded batch stopped, through the newest
+        processed_at present when the table is first read, so every read of
+        it in this run sees the same rows. Both are None on the raw layer.
+        """
+        name = table_name.replace('stg_', '')
+        if self.source_layer != 'processed':
+            return None, None
+        if name not in self.processed_windows:
+            rows = self.get_pool(redshift_connection).query(
+                "SELECT MAX(processed_through) AS processed_after "
+                "FROM etl_control.source_load_log WHERE table_name = %s",
+                (name,)
+            )
+            after = rows[0]['processed_after']
+            # processed_at is constant per write, so row group statistics skip older files
+            changed = self.spark.read.parquet(self.source_path(name))
+            if after is not None:
+                changed = changed.filter(F.col("processed_at") > F.lit(after))
+            through = changed.agg(F.max("processed_at")).first()[0] or after
+            logger.info(f"Staging {name} rows processed after {after} through {through}")
+            self.processed_windows[name] = (after, through)
+        return self.processed_windows[name]
+
+    def record_processed_windows(self, redshift_connection):
+        """Record how far each processed table was staged, once the batch is loaded"""
+        statement = load_planning.source_load_log_statement(self.processed_windows, self.batch_id)
+        if statement is not None:
+            self.execute_sql(statement, redshift_connection)
+
+    def read_current_key_map(self, dimension, business_key, surrogate_key, redshift_connection):
+        """Export the current business key -> surrogate key map of a dimension
+
+        Only two integer columns of the current rows are fetched, so the map
+        stays small enough to broadcast to every executor.
+        """
+        rows = self.get_pool(redshift_connection).query(
+            f"SELECT {business_key}, {surrogate_key} FROM dimensions.{dimension} WHERE is_current = true"
+        )
+        schema = StructType([
+            StructField(business_key, IntegerType()),
+            StructField(surrogate_key, IntegerType())
+        ])
+        logger.info(f"Exported {len(rows)} current keys from dimensions.{dimension}")
+        return self.spark.createDataFrame(
+            [(row[business_key], row[surrogate_key]) for row in rows], schema
+        )
+
+    def build_fact_sales_frame(self, orders_df, order_items_df, customer_keys, product_keys):
+        """Join order items to orders and resolve surrogate keys with broadcast joins
+
+        Derived order columns already present on orders_df, as when it was
+        read from the processed layer, are used as they are.
+        """
+        derived = [column for column, _ in load_planning.ORDER_DERIVED_COLUMNS if column in orders_df.columns]
+        orders = orders_df.select(
+            "order_id", "customer_id", "order_date", "order_status", "payment_method",
+            "payment_status", "shipping_method", "order_source", "coupon_code", "currency",
+            "subtotal", "tax_amount", "shipping_cost", "discount_amount", "total_amount",
+            "shipped_date", "delivered_date", *derived
+        )
+        items = order_items_df.select(
+            "order_item_id", "order_id", "product_id", "sku", "quantity", "unit_price", "line_total"
+        )
+
+        facts = items.join(orders, "order_id") \
+            .join(F.broadcast(customer_keys), "customer_id") \
+            .join(F.broadcast(product_keys), "product_id")
+
+        order_date = F.to_date(F.col("order_date"))
+
+        def order_derived(column, expr):
+            return (F.col(column) if column in derived else expr).alias(column)
+
+        return facts.select(
+            F.date_format(order_date, "yyyyMMdd").cast(IntegerType()).alias("order_date_key"),
+            "customer_key",
+            "product_key",
+            "order_id",
+            "order_item_id",
+            "sku",
+            "quantity",
+            "unit_price",
+            "line_total",
+            F.col("subtotal").alias("order_subtotal"),
+            F.col("tax_amount").alias("order_tax_amount"),
+            F.col("shipping_cost").alias("order_shipping_cost"),
+            F.col("discount_amount").alias("order_discount_amount"),
+            F.col("total_amount").alias("order_total_amount"),
+            "order_status",
+            "payment_method",
+            "payment_status",
+            "shipping_method",
+            "order_source",
+            "coupon_code",
+            "currency",
+            order_derived("order_year", F.year(order_date)),
+            order_derived("order_month", F.month(order_date)),
+            order_derived("order_quarter", F.quarter(order_date)),
+            order_derived("order_day_of_week", F.dayofweek(order_date)),
+            order_derived("is_weekend_order", F.dayofweek(order_date).isin([1, 7])),
+            order_derived("days_to_ship", F.datediff(F.col("shipped_date"), order_date)),
+            order_derived("days_to_deliver", F.datediff(F.col("delivered_date"), order_date)),
+            "shipped_date",
+            "delivered_date",
+            F.lit(self.batch_id).alias("etl_batch_id")
+        )
+
+    def load_fact_sales_keyed(self, redshift_connection):
+        """Build fact_sales rows in Spark and COPY them in order_date_key order
+
+        Surrogate keys are resolved against broadcast maps of the current
+        dimension rows, so the staging tables never have to be redistributed
+        across slices to meet the dimensions. The batch's date window is
+        restated: staged orders inside it are deleted and the COPY appends
+        the new rows, sorted by order_date_key, in the same transaction,
+        which also re-aggregates the sales summaries over the window.
+        """
+        try:
+            logger.info("Building fact_sales rows with Spark-side key resolution")
+
+            if self.is_batch_loaded('facts.fact_sales', redshift_connection):
+                logger.info(f"Batch {self.batch_id} already loaded into facts.fact_sales, skipping")
+                self.execute_statements(load_planning.sales_aggregate_statements(self.batch_id), redshift_connection)
+                return
+
+            min_key, max_key = self.get_batch_date_window(redshift_connection)
+            if min_key is None:
+                logger.info("No staged orders to load")
+                self.execute_statements(load_planning.sales_aggregate_statements(self.batch_id), redshift_connection)
+                return
+
+            fact_df = self.build_fact_sales_frame(
+                self.read_source('orders', self.processed_window('orders', redshift_connection)),
+                self.read_source('order_items', self.processed_window('order_items', redshift_connection)),
+                self.read_current_key_map('dim_customer', 'customer_id', 'customer_key', redshift_connection),
+                self.read_current_key_map('dim_product', 'product_id', 'product_key', redshift_connection)
+            )
+
+            self.bulk_load(
+                fact_df,
+                'facts.fact_sales',
+                redshift_connection,
+                sort_columns=['order_date_key', 'customer_key'],
+                pre_statements=[f"""
+                DELETE FROM facts.fact_sales
+                WHERE order_date_key BETWEEN {min_key} AND {max_key}
+                  AND order_id IN (SELECT order_id FROM staging.stg_orders);
+                """],
+                post_statements=load_planning.sales_aggregate_statements(self.batch_id, min_key, max_key) + [
+                    load_planning.fact_load_log_statement(
+                        'facts.fact_sales', 'order_date_key', 'restate', min_key, max_key, self.batch_id
+                    )
+                ]
+            )
+
             logger.info("Fact transformations completed")
-            
+
         except Exception as e:
-            logger.error(f"Error in fact transformation: {str(e)}")
+            logger.error(f"Error in keyed fact load: {str(e)}")
             raise
-    
+
+    def read_table_stats(self, tables, redshift_connection):
+        """Read the svv_table_info rows plan_maintenance needs for tables"""
+        return self.get_pool(redshift_connection).query("""
+            SELECT
+                "schema" || '.' || "table" AS table_name,
+                size AS size_mb,
+                tbl_rows,
+                estimated_visible_rows,
+                unsorted,
+                stats_off
+            FROM svv_table_info
+            WHERE "schema" || '.' || "table" IN %s
+        """, (tuple(tables),))
+
+    def maintain_tables(self, redshift_connection):
+        """Run the ANALYZE and VACUUM work the loaded tables need, within a time budget
+
+        Planned actions run one at a time outside a transaction block, as
+        Redshift requires for VACUUM. An action still pending when the
+        measured time passes --maintenance_budget_seconds is deferred to a
+        later run, and a failed action does not fail the published load.
+        Every action is recorded in etl_control.maintenance_log.
+        """
+        budget = float(self.args.get('maintenance_budget_seconds', DEFAULT_MAINTENANCE_BUDGET_SECONDS))
+        if budget <= 0:
+            logger.info("Table maintenance disabled")
+            return []
+
+        try:
+            table_stats = self.read_table_stats(MAINTENANCE_TABLES, redshift_connection)
+            plan = load_planning.plan_maintenance(table_stats, budget)
+            logger.info(f"Maintenance plan: {plan}")
+
+            started = time.monotonic()
+            for action in plan:
+                action['elapsed_seconds'] = None
+                if action['status'] != 'planned':
+                    continue
+                if time.monotonic() - started + action['estimated_seconds'] > budget:
+                    action['status'] = 'deferred'
+                    continue
+                try:
+                    results = self.execute_statements(
+                        [f"{action['action']} {action['table_name']};"],
+                        redshift_connection,
+                        transaction=False
+                    )
+                    action['status'] = 'completed'
+                    action['elapsed_seconds'] = results[0]['elapsed_seconds']
+                except Exception as e:
+                    logger.error(f"{action['action']} {action['table_name']} failed: {str(e)}")
+                    action['status'] = 'failed'
+
+            if plan:
+                self.execute_sql(load_planning.maintenance_log_statement(plan, self.batch_id), redshift_connection)
+            logger.info(f"Table maintenance completed in {time.monotonic() - started:.1f}s")
+            return plan
+
+        except Exception as e:
+            logger.error(f"Error in table maintenance: {str(e)}")
+            raise
+
+    def refresh_materialized_views(self, redshift_connection):
+        """Refresh the materialized views whose base tables changed in this batch
+
+        Views refresh after the views they are built on; their DISTINCT
+        counts and outer joins force full recomputes, so skipping unchanged
+        views is the saving. A failure skips its dependants, is logged to
+        etl_control.mv_refresh_log and raised once the others are done.
+        """
+        try:
+            order = load_planning.stale_materialized_views(self.changed_tables)
+            if not order:
+                logger.info("No materialized view reads a changed table")
+                return []
+            logger.info(f"Refreshing materialized views: {order}")
+
+            refreshes = []
+            failed = set()
+            for name in order:
+                refresh = {'view_name': name, 'elapsed_seconds': None}
+                if failed.intersection(load_planning.MATERIALIZED_VIEWS[name]['depends_on']):
+                    refresh['status'] = 'skipped'
+                    failed.add(name)
+                else:
+                    try:
+                        results = self.execute_statements(
+                            [f"REFRESH MATERIALIZED VIEW {name};"],
+                            redshift_connection,
+                            transaction=False
+                        )
+                        refresh['status'] = 'completed'
+                        refresh['elapsed_seconds'] = results[0]['elapsed_seconds']
+                    except Exception as e:
+                        logger.error(f"Refresh of {name} failed: {str(e)}")
+                        refresh['status'] = 'failed'
+                        failed.add(name)
+                refreshes.append(refresh)
+
+            rows = ',\n                '.join(
+                f"('{self.batch_id}', '{r['view_name']}', '{r['status']}', "
+                f"{'NULL' if r['elapsed_seconds'] is None else r['elapsed_seconds']})"
+                for r in refreshes
+            )
+            self.execute_sql(f"""
+            INSERT INTO etl_control.mv_refresh_log (etl_batch_id, view_name, status, elapsed_seconds)
+            VALUES
+                {rows};
+            """, redshift_connection)
+
+            if failed:
+                raise RuntimeError(f"Materialized view refresh failed for: {sorted(failed)}")
+            logger.info(f"Materialized view refresh timings: {refreshes}")
+            return refreshes
+
+        except Exception as e:
+            logger.error(f"Error refreshing materialized views: {str(e)}")
+            raise
+
+    def build_fact_web_events_frame(self, events_df, customer_keys, product_keys):
+        """Resolve surrogate keys of web events with broadcast joins
+
+        Anonymous events and events without a product keep a NULL key, so
+        both joins are left joins. Derived event columns already present on
+        events_df, as when it was read from the processed layer, are used
+        as they are.
+        """
+        events = events_df.join(F.broadcast(customer_keys), "customer_id", "left") \
+            .join(F.broadcast(product_keys), "product_id", "left")
+
+        event_date = F.to_date(F.col("event_timestamp"))
+
+        def event_derived(column, expr):
+            return (F.col(column) if column in events_df.columns else expr).alias(column)
+
+        return events.select(
+            event_derived("event_date_key", F.date_format(event_date, "yyyyMMdd").cast(IntegerType())),
+            "customer_key",
+            "product_key",
+            "event_id",
+            "session_id",
+            "event_type",
+            "event_timestamp",
+            "page_url",
+            "referrer_url",
+            "device_type",
+            "browser",
+            "os",
+            "user_agent",
+            "ip_address",
+            event_derived(
+                "is_conversion_event", F.col("event_type").isin(schema_registry.CONVERSION_EVENT_TYPES)
+            ),
+            event_derived(
+                "is_purchase_event", F.col("event_type").isin(schema_registry.PURCHASE_EVENT_TYPES)
+            ),
+            event_derived("event_year", F.year(event_date)),
+            event_derived("event_month", F.month(event_date)),
+            event_derived("event_quarter", F.quarter(event_date)),
+            event_derived("event_day_of_week", F.dayofweek(event_date)),
+            event_derived("event_hour", F.hour(F.col("event_timestamp"))),
+            F.lit(self.batch_id).alias("etl_batch_id")
+        ).filter(
+            F.col("event_id").isNotNull() & F.col("session_id").isNotNull() &
+            F.col("event_type").isNotNull() & F.col("event_timestamp").isNotNull()
+        )
+
+    def load_fact_web_events(self, redshift_connection):
+        """Bulk load web events into fact_web_events in sort key order
+
+        Events from the last loaded event_date_key on are deleted and
+        reloaded by one manifest COPY of Parquet sorted on the SORTKEY, so
+        reruns never duplicate; late events for earlier days are missed.
+        """
+        try:
+            logger.info("Building fact_web_events rows with Spark-side key resolution")
+
+            if self.is_batch_loaded('facts.fact_web_events', redshift_connection):
+                logger.info(f"Batch {self.batch_id} already loaded into facts.fact_web_events, skipping")
+                return
+
+            rows = self.get_pool(redshift_connection).query(
+                "SELECT MAX(event_date_key) AS max_key FROM facts.fact_web_events"
+            )
+            loaded_max_key = rows[0]['max_key']
+
+            events_df = self.read_source('web_events')
+            if loaded_max_key is not None:
+                logger.info(f"Loading web events from event_date_key {loaded_max_key}")
+                events_df = events_df.filter(
+                    F.to_date(F.col("event_timestamp"))
+                    >= F.to_date(F.lit(str(loaded_max_key)), "yyyyMMdd")
+                )
+
+            events_df = self.build_fact_web_events_frame(
+                events_df,
+                self.read_current_key_map('dim_customer', 'customer_id', 'customer_key', redshift_connection),
+                self.read_current_key_map('dim_product', 'product_id', 'product_key', redshift_connection)
+            )
+            # The date window and the COPY files come from the same resolved rows
+            events_df = events_df.persist(StorageLevel.MEMORY_AND_DISK)
+
+            window = events_df.agg(
+                F.min("event_date_key").alias("min_key"), F.max("event_date_key").alias("max_key")
+            ).first()
+            if window["min_key"] is None:
+                logger.info("No web events to load")
+            else:
+                self.bulk_load(
+                    events_df,
+                    'facts.fact_web_events',
+                    redshift_connection,
+                    sort_columns=['event_date_key', 'event_timestamp'],
+                    pre_statements=[f"""
+                    DELETE FROM facts.fact_web_events
+                    WHERE event_date_key BETWEEN {window["min_key"]} AND {window["max_key"]};
+                    """],
+                    post_statements=[load_planning.fact_load_log_statement(
+                        'facts.fact_web_events', 'event_date_key', 'restate',
+                        window["min_key"], window["max_key"], self.batch_id
+                    )]
+                )
+                logger.info("Web event facts completed")
+
+            events_df.unpersist()
+
+        except Exception as e:
+            logger.error(f"Error in web event fact load: {str(e)}")
+            raise
+
+    def read_latest_stock(self, snapshot_date_key, redshift_connection):
+        """Export each product's stock_quantity from its latest snapshot before snapshot_date_key"""
+        rows = self.get_pool(redshift_connection).query("""
+            SELECT product_key, stock_quantity
+            FROM (
+                SELECT product_key, stock_quantity,
+                       ROW_NUMBER() OVER (PARTITION BY product_key ORDER BY snapshot_date_key DESC) AS snapshot_rank
+                FROM facts.fact_inventory
+                WHERE snapshot_date_key < %s
+            ) latest
+            WHERE snapshot_rank = 1
+        """, (snapshot_date_key,))
+        schema = StructType([
+            StructField('product_key', IntegerType()),
+            StructField('previous_stock_quantity', IntegerType())
+        ])
+        logger.info(f"Exported latest stock of {len(rows)} products from facts.fact_inventory")
+        return self.spark.createDataFrame(
+            [(row['product_key'], row['stock_quantity']) for row in rows], schema
+        )
+
+    def read_units_sold(self, snapshot_date, redshift_connection):
+        """Export units sold per product on snapshot_date from the published fact_sales
+
+        Staging only holds the orders processed since the last batch, so the
+        day's sales come from fact_sales, restricted to one order_date_key
+        so zone maps skip every other day.
+        """
+        rows = self.get_pool(redshift_connection).query("""
+            SELECT dp.product_id, SUM(fs.quantity) AS units_sold_today
+            FROM facts.fact_sales fs
+            JOIN dimensions.dim_product dp ON fs.product_key = dp.product_key
+            WHERE fs.order_date_key = %s
+            GROUP BY dp.product_id
+        """, (int(snapshot_date.strftime('%Y%m%d')),))
+        schema = StructType([
+            StructField('product_id', IntegerType()),
+            StructField('units_sold_today', IntegerType())
+        ])
+        logger.info(f"Exported units sold on {snapshot_date} for {len(rows)} products from fact_sales")
+        return self.spark.createDataFrame(
+            [(row['product_id'], int(row['units_sold_today'])) for row in rows], schema
+        )
+
+    def build_inventory_snapshot_frame(self, products_df, units_sold, product_keys, snapshot_date):
+        """Build one fact_inventory row per current product for snapshot_date
+
+        The latest source row per product supplies stock and cost, the
+        stock flags are derived from stock_quantity and reorder_level, and
+        units_sold_today comes from units_sold (product_id, units_sold_today).
+        """
+        latest = products_df.groupBy("product_id").agg(
+            F.max(F.struct("updated_at", "stock_quantity", "reorder_level", "cost")).alias("latest")
+        ).select("product_id", "latest.stock_quantity", "latest.reorder_level", "latest.cost") \
+            .filter(F.col("stock_quantity").isNotNull())
+
+        stock = F.col("stock_quantity")
+        return latest.join(F.broadcast(product_keys), "product_id") \
+            .join(F.broadcast(units_sold), "product_id", "left") \
+            .select(
+                F.lit(int(snapshot_date.strftime('%Y%m%d'))).alias("snapshot_date_key"),
+                "product_key",
+                "stock_quantity",
+                "reorder_level",
+                (stock * F.col("cost")).cast(DecimalType(12, 2)).alias("stock_value"),
+                F.coalesce(F.col("units_sold_today"), F.lit(0)).cast(IntegerType()).alias("units_sold_today"),
+                (stock <= 0).alias("is_out_of_stock"),
+                F.coalesce((stock > 0) & (stock <= F.col("reorder_level")), F.lit(False)).alias("is_low_stock"),
+                F.lit(snapshot_date.year).alias("snapshot_year"),
+                F.lit(snapshot_date.month).alias("snapshot_month"),
+                F.lit((snapshot_date.month - 1) // 3 + 1).alias("snapshot_quarter"),
+                F.lit(self.batch_id).alias("etl_batch_id")
+            )
+
+    def load_inventory_snapshot(self, redshift_connection):
+        """Load the daily inventory snapshot into fact_inventory through the bulk path
+
+        --inventory_snapshot_date picks the day (default: today, UTC). With
+        --inventory_snapshot_mode=delta only products whose stock differs
+        from their latest earlier snapshot get a row, so a product's stock
+        on any day is its latest snapshot on or before that day. Rerunning a
+        day replaces its snapshot in the same transaction as the COPY.
+        """
+        try:
+            snapshot_date = datetime.strptime(
+                self.args.get('inventory_snapshot_date') or datetime.utcnow().strftime('%Y-%m-%d'),
+                '%Y-%m-%d'
+            ).date()
+            snapshot_date_key = int(snapshot_date.strftime('%Y%m%d'))
+            mode = self.args.get('inventory_snapshot_mode', 'full')
+            logger.info(f"Building {mode} inventory snapshot for {snapshot_date}")
+
+            snapshot_df = self.build_inventory_snapshot_frame(
+                self.read_source('products'),
+                self.read_units_sold(snapshot_date, redshift_connection),
+                self.read_current_key_map('dim_product', 'product_id', 'product_key', redshift_connection),
+                snapshot_date
+            )
+
+            if mode == 'delta':
+                previous = self.read_latest_stock(snapshot_date_key, redshift_connection)
+                snapshot_df = snapshot_df.join(F.broadcast(previous), "product_key", "left") \
+                    .filter(
+                        F.col("previous_stock_quantity").isNull() |
+                        (F.col("previous_stock_quantity") != F.col("stock_quantity"))
+                    ) \
+                    .drop("previous_stock_quantity")
+
+            self.bulk_load(
+                snapshot_df,
+                'facts.fact_inventory',
+                redshift_connection,
+                sort_columns=['snapshot_date_key', 'product_key'],
+                pre_statements=[
+                    f"DELETE FROM facts.fact_inventory WHERE snapshot_date_key = {snapshot_date_key};"
+                ],
+                post_statements=[load_planning.fact_load_log_statement(
+                    'facts.fact_inventory', 'snapshot_date_key', mode,
+                    snapshot_date_key, snapshot_date_key, self.batch_id
+                )]
+            )
+
+            logger.info("Inventory snapshot completed")
+
+        except Exception as e:
+            logger.error(f"Error in inventory snapshot load: {str(e)}")
+            raise
+
+    def get_pool(self, redshift_connection):
+        """Return the shared connection pool, creating it on first use
+
+        --redshift_dsn points the loader at any PostgreSQL-compatible endpoint,
+        e.g. a local PostgreSQL instance in tests; otherwise the Glue
+        connection's JDBC settings are used.
+        """
+        if self.pool is None:
+            max_connections = int(self.args.get('max_connections', 4))
+            if self.args.get('redshift_dsn'):
+                self.pool = RedshiftConnectionPool(
+                    self.args['redshift_dsn'], max_connections=max_connections
+                )
+            else:
+                self.pool = RedshiftConnectionPool.from_glue_connection(
+                    self.glueContext,
+                    redshift_connection,
+                    self.args.get('redshift_database', 'ecommerce_dwh_dev'),
+                    max_connections=max_connections
+                )
+        return self.pool
+
     def execute_sql(self, sql, redshift_connection):
         """Execute SQL statement in Redshift"""
+        return self.execute_statements([sql], redshift_connection)
+
+    def execute_statements(self, statements, redshift_connection, transaction=True):
+        """Execute a list of SQL statements in Redshift, in one transaction by default"""
         try:
-            # This is a simplified approach - in practice, you'd use a proper JDBC connection
-            logger.info(f"Executing SQL: {sql[:100]}...")
-            # Note: Actual SQL execution would require JDBC connection setup
-            logger.info("SQL execution completed")
+            results = self.get_pool(redshift_connection).execute(statements, transaction=transaction)
+            self.record_changes(results)
+            total = sum(r['elapsed_seconds'] for r in results)
+            logger.info(f"SQL execution completed: {len(results)} statement(s) in {total:.2f}s")
+            return results
         except Exception as e:
             logger.error(f"Error executing SQL: {str(e)}")
             raise
 
+    def record_changes(self, results):
+        """Note the tables that executed statements modified"""
+        self.changed_tables |= load_planning.modified_tables(results)
+
+    def close(self):
+        """Release pooled Redshift connections"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
 def main():
     """Main Redshift loading process"""
     # Get job parameters
@@ -215,6 +1002,7 @@ def main():
         'redshift_connection',
         'redshift_database'
     ])
+    args.update(schema_registry.get_optional_args(sys.argv, OPTIONAL_ARGS))
     
     # Initialize Glue context
     sc = SparkContext()
@@ -229,16 +1017,39 @@ def main():
     try:
         logger.info("Starting Redshift data loading")
         
-        # Load staging tables
-        tables = ['stg_customers', 'stg_products', 'stg_orders', 'stg_order_items']
-        
-        for table in tables:
-            s3_path = f"s3://{args['raw_data_bucket']}/data/{table.replace('stg_', '')}.csv"
-            loader.load_to_redshift_staging(s3_path, table, args['redshift_connection'])
+        # COPY from Parquet is the bulk path; JDBC remains the default
+        if args.get('load_mode', 'jdbc') == 'copy':
+            load_staging = loader.copy_to_redshift_staging
+        else:
+            load_staging = loader.load_to_redshift_staging
+
+        # Staging tables are independent; dimensions and facts wait for all of them
+        loader.load_staging_tables(STAGING_TABLES, load_staging, args['redshift_connection'])
+
+        # Facts take their date keys from dim_date, so it must cover the batch first
+        loader.extend_date_dimension(args['redshift_connection'])
         
         # Transform to dimensional model
-        loader.transform_to_dimensions(args['redshift_connection'])
-        loader.transform_to_facts(args['redshift_connection'])
+        if args.get('fact_key_resolution', 'sql') == 'spark':
+            loader.transform_to_dimensions(args['redshift_connection'])
+            loader.load_fact_sales_keyed(args['redshift_connection'])
+        else:
+            loader.publish_batch(args['redshift_connection'])
+
+        # Daily stock snapshot, keyed to the product versions just published
+        loader.load_inventory_snapshot(args['redshift_connection'])
+
+        # Web events are far larger than sales and only ever bulk loaded
+        loader.load_fact_web_events(args['redshift_connection'])
+
+        # The next batch stages only what was processed after this one
+        loader.record_processed_windows(args['redshift_connection'])
+
+        # Keep sort order and statistics of the loaded tables healthy
+        loader.maintain_tables(args['redshift_connection'])
+
+        # Bring the analytics layer up to date with this batch
+        loader.refresh_materialized_views(args['redshift_connection'])
         
         logger.info("Redshift data loading completed successfully")
         
@@ -246,6 +1057,7 @@ def main():
         logger.error(f"Redshift loading failed: {str(e)}")
         raise
     finally:
+        loader.close()
         job.commit()
 
 if __name__ == "__main__":
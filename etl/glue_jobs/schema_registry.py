@@ -0,0 +1,255 @@
+"""
+Schema Registry for E-Commerce Source Tables
+
+Typed Spark schemas that mirror sql/ddl/create_staging_tables.sql. Every
+reader of the raw CSV files uses these so each file is parsed once, with
+no inference pass and no string-typed columns left to cast later. The
+columns the processing job derives are registered too, so readers of the
+processed Parquet layer get them typed as the staging tables expect.
+
+Author: Data Engineering Team
+"""
+
+from pyspark.sql import functions as F
+from pyspark.sql.types import (
+    BooleanType,
+    DateType,
+    DecimalType,
+    IntegerType,
+    LongType,
+    StringType,
+    StructField,
+    StructType,
+    TimestampType,
+)
+
+
+# Source table schemas, column for column with the staging DDL (minus ETL metadata)
+SCHEMAS = {
+    'customers': StructType([
+        StructField('customer_id', IntegerType()),
+        StructField('first_name', StringType()),
+        StructField('last_name', StringType()),
+        StructField('email', StringType()),
+        StructField('phone', StringType()),
+        StructField('date_of_birth', DateType()),
+        StructField('gender', StringType()),
+        StructField('address_line1', StringType()),
+        StructField('address_line2', StringType()),
+        StructField('city', StringType()),
+        StructField('state', StringType()),
+        StructField('postal_code', StringType()),
+        StructField('country', StringType()),
+        StructField('customer_segment', StringType()),
+        StructField('registration_date', TimestampType()),
+        StructField('last_login_date', TimestampType()),
+        StructField('is_active', BooleanType()),
+        StructField('created_at', TimestampType()),
+        StructField('updated_at', TimestampType()),
+    ]),
+    'products': StructType([
+        StructField('product_id', IntegerType()),
+        StructField('product_name', StringType()),
+        StructField('product_description', StringType()),
+        StructField('category_id', IntegerType()),
+        StructField('category_name', StringType()),
+        StructField('subcategory_name', StringType()),
+        StructField('brand', StringType()),
+        StructField('sku', StringType()),
+        StructField('price', DecimalType(10, 2)),
+        StructField('cost', DecimalType(10, 2)),
+        StructField('weight', DecimalType(8, 2)),
+        StructField('dimensions', StringType()),
+        StructField('color', StringType()),
+        StructField('size', StringType()),
+        StructField('material', StringType()),
+        StructField('stock_quantity', IntegerType()),
+        StructField('reorder_level', IntegerType()),
+        StructField('supplier_id', IntegerType()),
+        StructField('is_active', BooleanType()),
+        StructField('launch_date', DateType()),
+        StructField('created_at', TimestampType()),
+        StructField('updated_at', TimestampType()),
+    ]),
+    'orders': StructType([
+        StructField('order_id', IntegerType()),
+        StructField('customer_id', IntegerType()),
+        StructField('order_date', TimestampType()),
+        StructField('order_status', StringType()),
+        StructField('payment_method', StringType()),
+        StructField('payment_status', StringType()),
+        StructField('shipping_method', StringType()),
+        StructField('shipping_address_line1', StringType()),
+        StructField('shipping_address_line2', StringType()),
+        StructField('shipping_city', StringType()),
+        StructField('shipping_state', StringType()),
+        StructField('shipping_postal_code', StringType()),
+        StructField('shipping_country', StringType()),
+        StructField('subtotal', DecimalType(10, 2)),
+        StructField('tax_amount', DecimalType(10, 2)),
+        StructField('shipping_cost', DecimalType(10, 2)),
+        StructField('discount_amount', DecimalType(10, 2)),
+        StructField('total_amount', DecimalType(10, 2)),
+        StructField('currency', StringType()),
+        StructField('coupon_code', StringType()),
+        StructField('order_source', StringType()),
+        StructField('shipped_date', TimestampType()),
+        StructField('delivered_date', TimestampType()),
+        StructField('created_at', TimestampType()),
+        StructField('updated_at', TimestampType()),
+    ]),
+    'order_items': StructType([
+        StructField('order_item_id', IntegerType()),
+        StructField('order_id', IntegerType()),
+        StructField('product_id', IntegerType()),
+        StructField('product_name', StringType()),
+        StructField('sku', StringType()),
+        StructField('quantity', IntegerType()),
+        StructField('unit_price', DecimalType(10, 2)),
+        StructField('line_total', DecimalType(10, 2)),
+        StructField('created_at', TimestampType()),
+        StructField('updated_at', TimestampType()),
+    ]),
+    'web_events': StructType([
+        StructField('event_id', LongType()),
+        StructField('customer_id', IntegerType()),
+        StructField('session_id', StringType()),
+        StructField('event_type', StringType()),
+        StructField('event_timestamp', TimestampType()),
+        StructField('product_id', IntegerType()),
+        StructField('category_id', IntegerType()),
+        StructField('page_url', StringType()),
+        StructField('referrer_url', StringType()),
+        StructField('user_agent', StringType()),
+        StructField('ip_address', StringType()),
+        StructField('device_type', StringType()),
+        StructField('browser', StringType()),
+        StructField('os', StringType()),
+        StructField('created_at', TimestampType()),
+    ]),
+}
+
+# Business key of each source table, one processed row per key is current
+BUSINESS_KEYS = {
+    'customers': 'customer_id',
+    'products': 'product_id',
+    'orders': 'order_id',
+    'order_items': 'order_item_id',
+    'web_events': 'event_id',
+}
+
+# Columns ordering the versions of a key in the processed layer, newest last
+VERSION_COLUMNS = ['updated_at', 'created_at', 'processed_at']
+
+# Web events that represent a conversion step or a completed purchase
+CONVERSION_EVENT_TYPES = ['add_to_cart', 'checkout_start', 'purchase']
+PURCHASE_EVENT_TYPES = ['purchase']
+
+# Columns data_processing.py derives and writes to the processed Parquet
+# layer, typed as the matching staging columns
+DERIVED_SCHEMAS = {
+    'customers': StructType([
+        StructField('full_name', StringType()),
+        StructField('age', IntegerType()),
+        StructField('customer_lifetime_months', IntegerType()),
+        StructField('email_domain', StringType()),
+    ]),
+    'products': StructType([
+        StructField('profit_margin', DecimalType(5, 4)),
+        StructField('price_category', StringType()),
+        StructField('stock_status', StringType()),
+    ]),
+    'orders': StructType([
+        StructField('order_year', IntegerType()),
+        StructField('order_month', IntegerType()),
+        StructField('order_quarter', IntegerType()),
+        StructField('order_day_of_week', IntegerType()),
+        StructField('is_weekend_order', BooleanType()),
+        StructField('days_to_ship', IntegerType()),
+        StructField('days_to_deliver', IntegerType()),
+    ]),
+    'web_events': StructType([
+        StructField('event_date_key', IntegerType()),
+        StructField('event_year', IntegerType()),
+        StructField('event_month', IntegerType()),
+        StructField('event_quarter', IntegerType()),
+        StructField('event_day_of_week', IntegerType()),
+        StructField('event_hour', IntegerType()),
+        StructField('is_conversion_event', BooleanType()),
+        StructField('is_purchase_event', BooleanType()),
+    ]),
+}
+
+
+def get_optional_args(argv, names):
+    """Resolve the optional Glue job arguments that were actually passed"""
+    # Imported here so the schemas stay usable outside a Glue runtime
+    from awsglue.utils import getResolvedOptions
+
+    present = [name for name in names if f'--{name}' in argv]
+    return getResolvedOptions(argv, present) if present else {}
+
+
+def get_schema(table_name):
+    """Return the StructType for a source table, accepting stg_ prefixed names"""
+    name = table_name[4:] if table_name.startswith('stg_') else table_name
+    if name not in SCHEMAS:
+        raise KeyError(f"No schema registered for table: {table_name}")
+    return SCHEMAS[name]
+
+
+def get_derived_schema(table_name):
+    """Return the derived columns of a processed table, empty when it has none"""
+    name = table_name[4:] if table_name.startswith('stg_') else table_name
+    return DERIVED_SCHEMAS.get(name, StructType([]))
+
+
+def read_csv(spark, path, table_name):
+    """Read a raw CSV file with its registered schema in a single parse"""
+    return (
+        spark.read
+        .schema(get_schema(table_name))
+        .option('header', True)
+        .option('mode', 'PERMISSIVE')
+        .csv(path)
+    )
+
+
+def read_processed(spark, path, table_name, processed_after=None, processed_through=None):
+    """Read a processed Parquet table as its source and derived columns
+
+    Incremental runs append new versions of changed rows, so only the
+    newest row per business key (by VERSION_COLUMNS) is kept, optionally
+    limited to processed_at in (processed_after, processed_through].
+    Columns are cast to their registered types to match staging.
+    """
+    fields = get_schema(table_name).fields + get_derived_schema(table_name).fields
+    df = spark.read.parquet(path)
+    if processed_after is not None:
+        df = df.filter(F.col('processed_at') > F.lit(processed_after))
+    if processed_through is not None:
+        df = df.filter(F.col('processed_at') <= F.lit(processed_through))
+
+    name = table_name[4:] if table_name.startswith('stg_') else table_name
+    key_column = BUSINESS_KEYS[name]
+    ordering = [F.col(c).alias(f"_version_{c}") for c in VERSION_COLUMNS if c in df.columns]
+    latest = df.groupBy(key_column).agg(
+        F.max(F.struct(*ordering, *[F.col(field.name) for field in fields])).alias("_latest")
+    )
+    return latest.select([
+        F.col(f"_latest.{field.name}").cast(field.dataType).alias(field.name) for field in fields
+    ])
+
+
+def conform(df, table_name):
+    """Cast columns of an already-loaded DataFrame to their registered types
+
+    Used on catalog reads, where the crawler may have guessed a type. This
+    is a projection only, so it folds into the read stage.
+    """
+    schema = get_schema(table_name)
+    registered = {field.name: field.dataType for field in schema.fields}
+    return df.select([
+        F.col(c).cast(registered[c]).alias(c) if c in registered else F.col(c)
+        for c in df.columns
+    ])
@@ -0,0 +1,67 @@
+"""
+Watermark Store
+
+Per-table high-watermarks of the incremental processing job, kept as one
+JSON document in S3 or in a local file.
+
+Author: Data Engineering Team
+"""
+
+import json
+import logging
+import os
+
+import boto3
+
+logger = logging.getLogger(__name__)
+
+
+class WatermarkStore:
+    """Per-table high-watermarks persisted as a single JSON document
+
+    The location is either an s3:// URI (one object, replaced by a single PUT)
+    or a local file path for tests (replaced with os.replace). Both make the
+    advance atomic: readers see the old document or the new one, never a mix.
+    """
+
+    def __init__(self, location):
+        self.location = location
+
+    def load(self):
+        """Return the stored watermarks, or an empty dict on first run"""
+        try:
+            if self.location.startswith('s3://'):
+                bucket, key = self.location[5:].split('/', 1)
+                s3 = boto3.client('s3')
+                try:
+                    response = s3.get_object(Bucket=bucket, Key=key)
+                except s3.exceptions.NoSuchKey:
+                    return {}
+                return json.loads(response['Body'].read())
+            if not os.path.exists(self.location):
+                return {}
+            with open(self.location) as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading watermarks from {self.location}: {str(e)}")
+            raise
+
+    def save(self, watermarks):
+        """Atomically replace the stored watermarks"""
+        body = json.dumps(watermarks, indent=2, sort_keys=True)
+        try:
+            if self.location.startswith('s3://'):
+                bucket, key = self.location[5:].split('/', 1)
+                boto3.client('s3').put_object(
+                    Bucket=bucket, Key=key, Body=body.encode('utf-8'),
+                    ContentType='application/json'
+                )
+            else:
+                tmp_path = f"{self.location}.tmp"
+                with open(tmp_path, 'w') as f:
+                    f.write(body)
+                os.replace(tmp_path, self.location)
+            logger.info(f"Advanced watermarks at {self.location}: {watermarks}")
+        except Exception as e:
+            logger.error(f"Error saving watermarks to {self.location}: {str(e)}")
+            raise
@@ -117,6 +117,7 @@ module "glue" {
   scripts_bucket        = module.s3.scripts_bucket_name
   raw_data_bucket       = module.s3.raw_data_bucket_name
   processed_data_bucket = module.s3.processed_data_bucket_name
+  redshift_database     = var.redshift_database_name
 
   tags = local.common_tags
 }
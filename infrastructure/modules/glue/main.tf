@@ -140,6 +140,26 @@ resource "aws_glue_trigger" "start_quality" {
   tags = var.tags
 }
 
+resource "aws_glue_trigger" "start_loading" {
+  name         = "${var.project_name}-${var.environment}-start-loading-trigger"
+  type         = "CONDITIONAL"
+  workflow_name = aws_glue_workflow.etl_workflow.name
+
+  predicate {
+    conditions {
+      logical_operator = "EQUALS"
+      job_name         = aws_glue_job.data_quality.name
+      state            = "SUCCEEDED"
+    }
+  }
+
+  actions {
+    job_name = aws_glue_job.redshift_loader.name
+  }
+
+  tags = var.tags
+}
+
 # CloudWatch Event Rule for Scheduling
 resource "aws_cloudwatch_event_rule" "etl_schedule" {
   name                = "${var.project_name}-${var.environment}-etl-schedule"
@@ -221,6 +241,10 @@ resource "aws_glue_job" "data_processing" {
     "--enable-spark-ui"                  = "true"
     "--spark-event-logs-path"            = "s3://${var.scripts_bucket}/spark-logs/"
     "--TempDir"                          = "s3://${var.scripts_bucket}/temp/"
+    "--extra-py-files"                   = join(",", [
+      for name in ["schema_registry", "watermark_store"] :
+      "s3://${var.scripts_bucket}/glue_jobs/${name}.py"
+    ])
     "--raw_data_bucket"                  = var.raw_data_bucket
     "--processed_data_bucket"            = var.processed_data_bucket
     "--database_name"                    = aws_glue_catalog_database.main.name
@@ -270,3 +294,45 @@ resource "aws_glue_job" "data_quality" {
     Name = "${var.project_name}-${var.environment}-data-quality-job"
   })
 }
+
+# Glue Job for Loading Redshift
+resource "aws_glue_job" "redshift_loader" {
+  name         = "${var.project_name}-${var.environment}-redshift-loader"
+  role_arn     = var.service_role_arn
+  glue_version = "4.0"
+  connections  = [aws_glue_connection.redshift.name]
+
+  command {
+    script_location = "s3://${var.scripts_bucket}/glue_jobs/redshift_loader.py"
+    python_version  = "3"
+  }
+
+  default_arguments = {
+    "--job-language"                     = "python"
+    "--job-bookmark-option"              = "job-bookmark-disable"
+    "--enable-metrics"                   = "true"
+    "--enable-continuous-cloudwatch-log" = "true"
+    "--TempDir"                          = "s3://${var.scripts_bucket}/temp/"
+    "--additional-python-modules"        = "psycopg2-binary"
+    "--extra-py-files"                   = join(",", [
+      for name in ["schema_registry", "date_dimension", "redshift_connection", "load_planning"] :
+      "s3://${var.scripts_bucket}/glue_jobs/${name}.py"
+    ])
+    "--raw_data_bucket"                  = var.raw_data_bucket
+    "--processed_data_bucket"            = var.processed_data_bucket
+    "--temp_bucket"                      = var.scripts_bucket
+    "--redshift_connection"              = aws_glue_connection.redshift.name
+    "--redshift_database"                = var.redshift_database
+  }
+
+  execution_property {
+    max_concurrent_runs = 1
+  }
+
+  max_capacity = 2.0
+  timeout      = 60
+
+  tags = merge(var.tags, {
+    Name = "${var.project_name}-${var.environment}-redshift-loader-job"
+  })
+}
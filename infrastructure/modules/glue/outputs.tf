@@ -49,3 +49,8 @@ output "data_quality_job_name" {
   description = "Name of the data quality Glue job"
   value       = aws_glue_job.data_quality.name
 }
+
+output "redshift_loader_job_name" {
+  description = "Name of the Redshift loader Glue job"
+  value       = aws_glue_job.redshift_loader.name
+}
@@ -43,6 +43,12 @@ variable "redshift_jdbc_url" {
   default     = ""
 }
 
+variable "redshift_database" {
+  description = "Redshift database the loader writes to"
+  type        = string
+  default     = ""
+}
+
 variable "redshift_username" {
   description = "Username for Redshift connection"
   type        = string
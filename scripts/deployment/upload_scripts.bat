@@ -20,6 +20,12 @@ cd ..\..\..
 echo Uploading Glue ETL scripts...
 aws s3 cp etl\glue_jobs\data_processing.py s3://%SCRIPTS_BUCKET%/glue_jobs/data_processing.py --region ap-south-1
 aws s3 cp etl\glue_jobs\data_quality.py s3://%SCRIPTS_BUCKET%/glue_jobs/data_quality.py --region ap-south-1
+aws s3 cp etl\glue_jobs\redshift_loader.py s3://%SCRIPTS_BUCKET%/glue_jobs/redshift_loader.py --region ap-south-1
+aws s3 cp etl\glue_jobs\schema_registry.py s3://%SCRIPTS_BUCKET%/glue_jobs/schema_registry.py --region ap-south-1
+aws s3 cp etl\glue_jobs\watermark_store.py s3://%SCRIPTS_BUCKET%/glue_jobs/watermark_store.py --region ap-south-1
+aws s3 cp etl\glue_jobs\redshift_connection.py s3://%SCRIPTS_BUCKET%/glue_jobs/redshift_connection.py --region ap-south-1
+aws s3 cp etl\glue_jobs\date_dimension.py s3://%SCRIPTS_BUCKET%/glue_jobs/date_dimension.py --region ap-south-1
+aws s3 cp etl\glue_jobs\load_planning.py s3://%SCRIPTS_BUCKET%/glue_jobs/load_planning.py --region ap-south-1
 
 echo.
 echo Verifying uploads...
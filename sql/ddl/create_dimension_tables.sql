@@ -35,9 +35,11 @@ CREATE TABLE dimensions.dim_customer (
     last_login_date TIMESTAMP,
     is_active BOOLEAN,
     -- SCD Type 2 fields
+    row_hash CHAR(32),
     effective_date TIMESTAMP NOT NULL,
     expiry_date TIMESTAMP,
     is_current BOOLEAN DEFAULT TRUE,
+    is_inferred BOOLEAN DEFAULT FALSE,
     -- ETL metadata
     created_at TIMESTAMP DEFAULT GETDATE(),
     updated_at TIMESTAMP DEFAULT GETDATE()
@@ -73,9 +75,11 @@ CREATE TABLE dimensions.dim_product (
     is_active BOOLEAN,
     launch_date DATE,
     -- SCD Type 2 fields
+    row_hash CHAR(32),
     effective_date TIMESTAMP NOT NULL,
     expiry_date TIMESTAMP,
     is_current BOOLEAN DEFAULT TRUE,
+    is_inferred BOOLEAN DEFAULT FALSE,
     -- ETL metadata
     created_at TIMESTAMP DEFAULT GETDATE(),
     updated_at TIMESTAMP DEFAULT GETDATE()
@@ -152,66 +156,10 @@ COMMENT ON TABLE dimensions.dim_customer IS 'Customer dimension with SCD Type 2
 COMMENT ON TABLE dimensions.dim_product IS 'Product dimension with SCD Type 2 for price and attribute changes';
 COMMENT ON TABLE dimensions.dim_date IS 'Date dimension for time-based analysis';
 COMMENT ON TABLE dimensions.dim_geography IS 'Geography dimension for location-based analysis';
+COMMENT ON COLUMN dimensions.dim_customer.row_hash IS 'MD5 of the SCD Type 2 tracked attributes, compared against staging to detect changes';
+COMMENT ON COLUMN dimensions.dim_product.row_hash IS 'MD5 of the SCD Type 2 tracked attributes, compared against staging to detect changes';
+COMMENT ON COLUMN dimensions.dim_customer.is_inferred IS 'Placeholder added for a customer referenced by facts before its record arrived';
+COMMENT ON COLUMN dimensions.dim_product.is_inferred IS 'Placeholder added for a product referenced by facts before its record arrived';
 
--- Populate date dimension with 10 years of data
-INSERT INTO dimensions.dim_date (
-    date_key,
-    date_actual,
-    day_of_week,
-    day_of_week_name,
-    day_of_month,
-    day_of_year,
-    week_of_year,
-    month_number,
-    month_name,
-    month_abbrev,
-    quarter_number,
-    quarter_name,
-    year_number,
-    is_weekend,
-    is_holiday,
-    fiscal_year,
-    fiscal_quarter,
-    fiscal_month,
-    is_business_day
-)
-SELECT 
-    CAST(TO_CHAR(date_series, 'YYYYMMDD') AS INTEGER) AS date_key,
-    date_series AS date_actual,
-    EXTRACT(DOW FROM date_series) + 1 AS day_of_week,
-    TO_CHAR(date_series, 'Day') AS day_of_week_name,
-    EXTRACT(DAY FROM date_series) AS day_of_month,
-    EXTRACT(DOY FROM date_series) AS day_of_year,
-    EXTRACT(WEEK FROM date_series) AS week_of_year,
-    EXTRACT(MONTH FROM date_series) AS month_number,
-    TO_CHAR(date_series, 'Month') AS month_name,
-    TO_CHAR(date_series, 'Mon') AS month_abbrev,
-    EXTRACT(QUARTER FROM date_series) AS quarter_number,
-    'Q' || EXTRACT(QUARTER FROM date_series) AS quarter_name,
-    EXTRACT(YEAR FROM date_series) AS year_number,
-    CASE WHEN EXTRACT(DOW FROM date_series) IN (0, 6) THEN TRUE ELSE FALSE END AS is_weekend,
-    FALSE AS is_holiday, -- Will be updated separately
-    CASE 
-        WHEN EXTRACT(MONTH FROM date_series) >= 4 THEN EXTRACT(YEAR FROM date_series)
-        ELSE EXTRACT(YEAR FROM date_series) - 1
-    END AS fiscal_year,
-    CASE 
-        WHEN EXTRACT(MONTH FROM date_series) IN (4,5,6) THEN 1
-        WHEN EXTRACT(MONTH FROM date_series) IN (7,8,9) THEN 2
-        WHEN EXTRACT(MONTH FROM date_series) IN (10,11,12) THEN 3
-        ELSE 4
-    END AS fiscal_quarter,
-    CASE 
-        WHEN EXTRACT(MONTH FROM date_series) >= 4 THEN EXTRACT(MONTH FROM date_series) - 3
-        ELSE EXTRACT(MONTH FROM date_series) + 9
-    END AS fiscal_month,
-    CASE WHEN EXTRACT(DOW FROM date_series) NOT IN (0, 6) THEN TRUE ELSE FALSE END AS is_business_day
-FROM (
-    SELECT DATEADD(day, seq, '2020-01-01'::DATE) AS date_series
-    FROM (
-        SELECT ROW_NUMBER() OVER (ORDER BY 1) - 1 AS seq
-        FROM information_schema.columns
-        LIMIT 3653  -- 10 years + leap days
-    )
-) dates
-WHERE date_series <= '2029-12-31';
+-- dim_date is populated by the Redshift loader (etl/glue_jobs/date_dimension.py),
+-- which extends it on every run to cover the staged orders and the years ahead
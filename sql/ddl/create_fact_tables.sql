@@ -8,6 +8,8 @@ CREATE SCHEMA IF NOT EXISTS facts;
 DROP TABLE IF EXISTS facts.fact_sales CASCADE;
 DROP TABLE IF EXISTS facts.fact_web_events CASCADE;
 DROP TABLE IF EXISTS facts.fact_inventory CASCADE;
+DROP TABLE IF EXISTS facts.fact_sales_daily CASCADE;
+DROP TABLE IF EXISTS facts.fact_sales_monthly CASCADE;
 
 -- Sales Fact Table (Order Items Level)
 CREATE TABLE facts.fact_sales (
@@ -138,6 +140,56 @@ DISTSTYLE KEY
 DISTKEY (product_key)
 SORTKEY (snapshot_date_key, product_key);
 
+-- Daily Sales Summary (Product Level)
+-- Re-aggregated from fact_sales by the loader for the days each batch touches
+CREATE TABLE facts.fact_sales_daily (
+    -- Dimension Keys
+    order_date_key INTEGER NOT NULL,
+    product_key INTEGER NOT NULL,
+    category_name VARCHAR(100),
+    -- Measures
+    line_count INTEGER NOT NULL,
+    order_count INTEGER NOT NULL,
+    total_units_sold BIGINT,
+    total_revenue DECIMAL(18,2),
+    unit_price_sum DECIMAL(18,2),
+    -- Distinct Count Sketches (combine with HLL_COMBINE)
+    customer_sketch HLLSKETCH,
+    order_sketch HLLSKETCH,
+    -- ETL Metadata
+    etl_batch_id VARCHAR(50),
+    created_at TIMESTAMP DEFAULT GETDATE()
+)
+DISTSTYLE KEY
+DISTKEY (product_key)
+SORTKEY (order_date_key, product_key);
+
+-- Monthly Sales Summary (Customer Geography and Segment Level)
+-- Re-aggregated from fact_sales by the loader for the months each batch touches
+CREATE TABLE facts.fact_sales_monthly (
+    -- Date Attributes
+    month_key INTEGER NOT NULL,
+    year_number INTEGER NOT NULL,
+    month_number INTEGER NOT NULL,
+    month_name VARCHAR(10),
+    quarter_number INTEGER,
+    -- Customer Attributes
+    state VARCHAR(50),
+    city VARCHAR(50),
+    customer_segment VARCHAR(20),
+    -- Measures
+    line_count INTEGER NOT NULL,
+    order_count INTEGER NOT NULL,
+    customer_count INTEGER NOT NULL,
+    total_units_sold BIGINT,
+    total_revenue DECIMAL(18,2),
+    -- ETL Metadata
+    etl_batch_id VARCHAR(50),
+    created_at TIMESTAMP DEFAULT GETDATE()
+)
+DISTSTYLE ALL
+SORTKEY (month_key);
+
 -- Create foreign key constraints (informational in Redshift)
 -- Sales Fact Foreign Keys
 ALTER TABLE facts.fact_sales 
@@ -178,6 +230,15 @@ ALTER TABLE facts.fact_inventory
 ADD CONSTRAINT fk_inventory_product 
 FOREIGN KEY (product_key) REFERENCES dimensions.dim_product(product_key);
 
+-- Sales Summary Foreign Keys
+ALTER TABLE facts.fact_sales_daily 
+ADD CONSTRAINT fk_sales_daily_date 
+FOREIGN KEY (order_date_key) REFERENCES dimensions.dim_date(date_key);
+
+ALTER TABLE facts.fact_sales_daily 
+ADD CONSTRAINT fk_sales_daily_product 
+FOREIGN KEY (product_key) REFERENCES dimensions.dim_product(product_key);
+
 -- Create additional indexes for query performance
 CREATE INDEX idx_fact_sales_order_id ON facts.fact_sales(order_id);
 CREATE INDEX idx_fact_sales_product_key ON facts.fact_sales(product_key);
@@ -199,6 +260,8 @@ COMMENT ON SCHEMA facts IS 'Fact tables schema for transactional and event data'
 COMMENT ON TABLE facts.fact_sales IS 'Sales fact table at order item level with comprehensive metrics';
 COMMENT ON TABLE facts.fact_web_events IS 'Web events fact table for user behavior analysis';
 COMMENT ON TABLE facts.fact_inventory IS 'Daily inventory snapshots for stock management and analysis';
+COMMENT ON TABLE facts.fact_sales_daily IS 'Daily sales per product, maintained incrementally from fact_sales';
+COMMENT ON TABLE facts.fact_sales_monthly IS 'Monthly sales per customer state, city and segment, maintained incrementally from fact_sales';
 
 -- Add column comments for key measures
 COMMENT ON COLUMN facts.fact_sales.line_profit IS 'Calculated as line_total - line_cost';
@@ -211,3 +274,8 @@ COMMENT ON COLUMN facts.fact_web_events.conversion_value IS 'Monetary value asso
 
 COMMENT ON COLUMN facts.fact_inventory.days_of_supply IS 'Current stock quantity divided by average daily sales';
 COMMENT ON COLUMN facts.fact_inventory.stock_turnover_rate IS 'Annual rate at which inventory is sold and replaced';
+
+COMMENT ON COLUMN facts.fact_sales_daily.customer_sketch IS 'HyperLogLog sketch of customer_key; HLL_CARDINALITY(HLL_COMBINE(customer_sketch)) estimates distinct customers across rows';
+COMMENT ON COLUMN facts.fact_sales_daily.order_sketch IS 'HyperLogLog sketch of order_id; HLL_CARDINALITY(HLL_COMBINE(order_sketch)) estimates distinct orders across rows';
+COMMENT ON COLUMN facts.fact_sales_monthly.month_key IS 'Calendar month as YYYYMM';
+COMMENT ON COLUMN facts.fact_sales_monthly.total_revenue IS 'Sum of order_total_amount over order item rows, as in monthly_sales_trends';
@@ -32,6 +32,11 @@ CREATE TABLE staging.stg_customers (
     is_active BOOLEAN,
     created_at TIMESTAMP,
     updated_at TIMESTAMP,
+    -- Derived by the processing job, loaded from the processed layer only
+    full_name VARCHAR(101),
+    age INTEGER,
+    customer_lifetime_months INTEGER,
+    email_domain VARCHAR(100),
     -- ETL metadata
     etl_batch_id VARCHAR(50),
     etl_loaded_at TIMESTAMP DEFAULT GETDATE()
@@ -64,6 +69,10 @@ CREATE TABLE staging.stg_products (
     launch_date DATE,
     created_at TIMESTAMP,
     updated_at TIMESTAMP,
+    -- Derived by the processing job, loaded from the processed layer only
+    profit_margin DECIMAL(5,4),
+    price_category VARCHAR(20),
+    stock_status VARCHAR(20),
     -- ETL metadata
     etl_batch_id VARCHAR(50),
     etl_loaded_at TIMESTAMP DEFAULT GETDATE()
@@ -99,6 +108,14 @@ CREATE TABLE staging.stg_orders (
     delivered_date TIMESTAMP,
     created_at TIMESTAMP,
     updated_at TIMESTAMP,
+    -- Derived by the processing job, loaded from the processed layer only
+    order_year INTEGER,
+    order_month INTEGER,
+    order_quarter INTEGER,
+    order_day_of_week INTEGER,
+    is_weekend_order BOOLEAN,
+    days_to_ship INTEGER,
+    days_to_deliver INTEGER,
     -- ETL metadata
     etl_batch_id VARCHAR(50),
     etl_loaded_at TIMESTAMP DEFAULT GETDATE()
@@ -1,218 +1,226 @@
 -- Business Intelligence Views for E-commerce Data Warehouse
 -- These views provide pre-aggregated data for common business questions
+-- The joins and aggregates come from the materialized views in
+-- materialized_views.sql, run that script first, and from the sales summary
+-- facts the loader maintains per batch (facts.fact_sales_daily and
+-- facts.fact_sales_monthly).
 
 -- Customer 360 View
 CREATE OR REPLACE VIEW analytics.customer_360 AS
-SELECT 
-    dc.customer_id,
-    dc.full_name,
-    dc.email,
-    dc.customer_segment,
-    dc.city,
-    dc.state,
-    dc.registration_date,
-    
+SELECT
+    mv.customer_id,
+    mv.full_name,
+    mv.email,
+    mv.customer_segment,
+    mv.city,
+    mv.state,
+    mv.registration_date,
+
     -- Order Statistics
-    COUNT(DISTINCT fs.order_id) as total_orders,
-    SUM(fs.order_total_amount) as lifetime_value,
-    AVG(fs.order_total_amount) as avg_order_value,
-    MIN(dd.date_actual) as first_order_date,
-    MAX(dd.date_actual) as last_order_date,
-    
+    mv.total_orders,
+    mv.lifetime_value,
+    mv.avg_order_value,
+    mv.first_order_date,
+    mv.last_order_date,
+
     -- Product Preferences
-    COUNT(DISTINCT fs.product_key) as unique_products_purchased,
-    
+    mv.unique_products_purchased,
+
     -- Behavioral Metrics
-    DATEDIFF(day, MAX(dd.date_actual), CURRENT_DATE) as days_since_last_order,
-    CASE 
-        WHEN DATEDIFF(day, MAX(dd.date_actual), CURRENT_DATE) <= 30 THEN 'Active'
-        WHEN DATEDIFF(day, MAX(dd.date_actual), CURRENT_DATE) <= 90 THEN 'At Risk'
+    DATEDIFF(day, mv.last_order_date, CURRENT_DATE) as days_since_last_order,
+    CASE
+        WHEN DATEDIFF(day, mv.last_order_date, CURRENT_DATE) <= 30 THEN 'Active'
+        WHEN DATEDIFF(day, mv.last_order_date, CURRENT_DATE) <= 90 THEN 'At Risk'
         ELSE 'Churned'
     END as customer_status,
-    
+
     -- RFM Analysis Components
-    DATEDIFF(day, MAX(dd.date_actual), CURRENT_DATE) as recency,
-    COUNT(DISTINCT fs.order_id) as frequency,
-    SUM(fs.order_total_amount) as monetary
-    
-FROM dimensions.dim_customer dc
-LEFT JOIN facts.fact_sales fs ON dc.customer_key = fs.customer_key
-LEFT JOIN dimensions.dim_date dd ON fs.order_date_key = dd.date_key
-WHERE dc.is_current = true
-GROUP BY 
-    dc.customer_id, dc.full_name, dc.email, dc.customer_segment,
-    dc.city, dc.state, dc.registration_date;
+    DATEDIFF(day, mv.last_order_date, CURRENT_DATE) as recency,
+    mv.total_orders as frequency,
+    mv.lifetime_value as monetary
+
+FROM analytics.mv_customer_360 mv;
 
 -- Product Performance Dashboard
 CREATE OR REPLACE VIEW analytics.product_performance AS
-SELECT 
-    dp.product_id,
-    dp.product_name,
-    dp.category_name,
-    dp.brand,
-    dp.price,
-    dp.cost,
-    
+SELECT
+    mv.product_id,
+    mv.product_name,
+    mv.category_name,
+    mv.brand,
+    mv.price,
+    mv.cost,
+
     -- Sales Metrics
-    SUM(fs.quantity) as total_units_sold,
-    SUM(fs.line_total) as total_revenue,
-    SUM(fs.quantity * dp.cost) as total_cost,
-    SUM(fs.line_total) - SUM(fs.quantity * dp.cost) as gross_profit,
-    
+    mv.total_units_sold,
+    mv.total_revenue,
+    mv.total_cost,
+    mv.total_revenue - mv.total_cost as gross_profit,
+
     -- Profitability
-    CASE 
-        WHEN SUM(fs.line_total) > 0 
-        THEN ROUND(((SUM(fs.line_total) - SUM(fs.quantity * dp.cost)) / SUM(fs.line_total)) * 100, 2)
-        ELSE 0 
+    CASE
+        WHEN mv.total_revenue > 0
+        THEN ROUND(((mv.total_revenue - mv.total_cost) / mv.total_revenue) * 100, 2)
+        ELSE 0
     END as gross_margin_percent,
-    
+
     -- Performance Metrics
-    COUNT(DISTINCT fs.order_id) as orders_containing_product,
-    COUNT(DISTINCT fs.customer_key) as unique_customers,
-    AVG(fs.unit_price) as avg_selling_price,
-    
+    mv.orders_containing_product,
+    mv.unique_customers,
+    mv.avg_selling_price,
+
     -- Ranking
-    RANK() OVER (PARTITION BY dp.category_name ORDER BY SUM(fs.line_total) DESC) as revenue_rank_in_category,
-    RANK() OVER (ORDER BY SUM(fs.line_total) DESC) as overall_revenue_rank
-    
-FROM dimensions.dim_product dp
-LEFT JOIN facts.fact_sales fs ON dp.product_key = fs.product_key
-WHERE dp.is_current = true
-GROUP BY 
-    dp.product_id, dp.product_name, dp.category_name, dp.brand, dp.price, dp.cost;
+    RANK() OVER (PARTITION BY mv.category_name ORDER BY mv.total_revenue DESC) as revenue_rank_in_category,
+    RANK() OVER (ORDER BY mv.total_revenue DESC) as overall_revenue_rank
+
+FROM analytics.mv_product_performance mv;
 
 -- Monthly Sales Trends
-CREATE OR REPLACE VIEW analytics.monthly_sales_trends AS
-SELECT 
-    dd.year_number,
-    dd.month_number,
-    dd.month_name,
-    dd.quarter_number,
-    
+-- Each order and customer_key falls in one geography and segment row per
+-- month, so summing the monthly summary's counts gives exact distinct counts
+DROP VIEW IF EXISTS analytics.monthly_sales_trends;
+CREATE VIEW analytics.monthly_sales_trends AS
+WITH monthly AS (
+    SELECT
+        year_number,
+        month_number,
+        month_name,
+        quarter_number,
+        SUM(order_count) as total_orders,
+        SUM(customer_count) as unique_customers,
+        SUM(total_revenue) as total_revenue,
+        SUM(total_units_sold) as total_units_sold,
+        SUM(total_revenue) / SUM(line_count) as avg_order_value
+    FROM facts.fact_sales_monthly
+    GROUP BY year_number, month_number, month_name, quarter_number
+)
+SELECT
+    m.year_number,
+    m.month_number,
+    m.month_name,
+    m.quarter_number,
+
     -- Sales Metrics
-    COUNT(DISTINCT fs.order_id) as total_orders,
-    COUNT(DISTINCT fs.customer_key) as unique_customers,
-    SUM(fs.order_total_amount) as total_revenue,
-    SUM(fs.quantity) as total_units_sold,
-    AVG(fs.order_total_amount) as avg_order_value,
-    
+    m.total_orders,
+    m.unique_customers,
+    m.total_revenue,
+    m.total_units_sold,
+    m.avg_order_value,
+
     -- Growth Metrics
-    LAG(SUM(fs.order_total_amount)) OVER (ORDER BY dd.year_number, dd.month_number) as prev_month_revenue,
-    CASE 
-        WHEN LAG(SUM(fs.order_total_amount)) OVER (ORDER BY dd.year_number, dd.month_number) > 0
-        THEN ROUND(((SUM(fs.order_total_amount) - LAG(SUM(fs.order_total_amount)) OVER (ORDER BY dd.year_number, dd.month_number)) / LAG(SUM(fs.order_total_amount)) OVER (ORDER BY dd.year_number, dd.month_number)) * 100, 2)
+    LAG(m.total_revenue) OVER (ORDER BY m.year_number, m.month_number) as prev_month_revenue,
+    CASE
+        WHEN LAG(m.total_revenue) OVER (ORDER BY m.year_number, m.month_number) > 0
+        THEN ROUND(((m.total_revenue - LAG(m.total_revenue) OVER (ORDER BY m.year_number, m.month_number)) / LAG(m.total_revenue) OVER (ORDER BY m.year_number, m.month_number)) * 100, 2)
         ELSE NULL
     END as revenue_growth_percent,
-    
+
     -- Customer Metrics
-    LAG(COUNT(DISTINCT fs.customer_key)) OVER (ORDER BY dd.year_number, dd.month_number) as prev_month_customers,
-    CASE 
-        WHEN LAG(COUNT(DISTINCT fs.customer_key)) OVER (ORDER BY dd.year_number, dd.month_number) > 0
-        THEN ROUND(((COUNT(DISTINCT fs.customer_key) - LAG(COUNT(DISTINCT fs.customer_key)) OVER (ORDER BY dd.year_number, dd.month_number)) / LAG(COUNT(DISTINCT fs.customer_key)) OVER (ORDER BY dd.year_number, dd.month_number)) * 100, 2)
+    LAG(m.unique_customers) OVER (ORDER BY m.year_number, m.month_number) as prev_month_customers,
+    CASE
+        WHEN LAG(m.unique_customers) OVER (ORDER BY m.year_number, m.month_number) > 0
+        THEN ROUND(((m.unique_customers - LAG(m.unique_customers) OVER (ORDER BY m.year_number, m.month_number)) / LAG(m.unique_customers) OVER (ORDER BY m.year_number, m.month_number)) * 100, 2)
         ELSE NULL
     END as customer_growth_percent
-    
-FROM facts.fact_sales fs
-JOIN dimensions.dim_date dd ON fs.order_date_key = dd.date_key
-GROUP BY dd.year_number, dd.month_number, dd.month_name, dd.quarter_number
-ORDER BY dd.year_number, dd.month_number;
+
+FROM monthly m
+ORDER BY m.year_number, m.month_number;
 
 -- Category Performance Analysis
-CREATE OR REPLACE VIEW analytics.category_performance AS
-SELECT 
-    dp.category_name,
-    
+-- Distinct customers and orders span products and days, so they are
+-- HyperLogLog estimates combined from the daily summary's sketches, typically
+-- within about 1% of the exact count; query facts.fact_sales for exact figures
+DROP VIEW IF EXISTS analytics.category_performance;
+CREATE VIEW analytics.category_performance AS
+WITH category AS (
+    SELECT
+        dp.category_name,
+        COUNT(DISTINCT dp.product_id) as total_products,
+        COUNT(DISTINCT CASE WHEN d.product_key IS NOT NULL THEN dp.product_id END) as products_with_sales,
+        SUM(d.total_units_sold) as total_units_sold,
+        SUM(d.total_revenue) as total_revenue,
+        SUM(d.unit_price_sum) / SUM(d.line_count) as avg_selling_price,
+        COALESCE(HLL_CARDINALITY(HLL_COMBINE(d.customer_sketch)), 0) as unique_customers,
+        COALESCE(HLL_CARDINALITY(HLL_COMBINE(d.order_sketch)), 0) as total_orders
+    FROM dimensions.dim_product dp
+    LEFT JOIN facts.fact_sales_daily d ON dp.product_key = d.product_key
+    WHERE dp.is_current = true
+    GROUP BY dp.category_name
+)
+SELECT
+    c.category_name,
+
     -- Product Metrics
-    COUNT(DISTINCT dp.product_id) as total_products,
-    COUNT(DISTINCT CASE WHEN fs.product_key IS NOT NULL THEN dp.product_id END) as products_with_sales,
-    
+    c.total_products,
+    c.products_with_sales,
+
     -- Sales Metrics
-    SUM(fs.quantity) as total_units_sold,
-    SUM(fs.line_total) as total_revenue,
-    AVG(fs.unit_price) as avg_selling_price,
-    
+    c.total_units_sold,
+    c.total_revenue,
+    c.avg_selling_price,
+
     -- Customer Metrics
-    COUNT(DISTINCT fs.customer_key) as unique_customers,
-    COUNT(DISTINCT fs.order_id) as total_orders,
-    
+    c.unique_customers,
+    c.total_orders,
+
     -- Market Share
-    ROUND((SUM(fs.line_total) / SUM(SUM(fs.line_total)) OVER ()) * 100, 2) as revenue_market_share_percent,
-    
+    ROUND((c.total_revenue / SUM(c.total_revenue) OVER ()) * 100, 2) as revenue_market_share_percent,
+
     -- Performance Ranking
-    RANK() OVER (ORDER BY SUM(fs.line_total) DESC) as revenue_rank,
-    RANK() OVER (ORDER BY SUM(fs.quantity) DESC) as volume_rank
-    
-FROM dimensions.dim_product dp
-LEFT JOIN facts.fact_sales fs ON dp.product_key = fs.product_key
-WHERE dp.is_current = true
-GROUP BY dp.category_name
-ORDER BY total_revenue DESC;
+    RANK() OVER (ORDER BY c.total_revenue DESC) as revenue_rank,
+    RANK() OVER (ORDER BY c.total_units_sold DESC) as volume_rank
+
+FROM category c
+ORDER BY c.total_revenue DESC;
 
 -- Geographic Sales Analysis
 CREATE OR REPLACE VIEW analytics.geographic_sales AS
-SELECT 
-    dc.state,
-    dc.city,
-    
+SELECT
+    mv.state,
+    mv.city,
+
     -- Customer Metrics
-    COUNT(DISTINCT dc.customer_id) as total_customers,
-    COUNT(DISTINCT CASE WHEN fs.customer_key IS NOT NULL THEN dc.customer_id END) as active_customers,
-    
+    mv.total_customers,
+    mv.active_customers,
+
     -- Sales Metrics
-    COUNT(DISTINCT fs.order_id) as total_orders,
-    SUM(fs.order_total_amount) as total_revenue,
-    AVG(fs.order_total_amount) as avg_order_value,
-    
+    mv.total_orders,
+    mv.total_revenue,
+    mv.avg_order_value,
+
     -- Performance Metrics
-    ROUND(SUM(fs.order_total_amount) / COUNT(DISTINCT dc.customer_id), 2) as revenue_per_customer,
-    ROUND(COUNT(DISTINCT fs.order_id) * 1.0 / COUNT(DISTINCT dc.customer_id), 2) as orders_per_customer,
-    
+    ROUND(mv.total_revenue / mv.total_customers, 2) as revenue_per_customer,
+    ROUND(mv.total_orders * 1.0 / mv.total_customers, 2) as orders_per_customer,
+
     -- Market Share
-    ROUND((SUM(fs.order_total_amount) / SUM(SUM(fs.order_total_amount)) OVER ()) * 100, 2) as revenue_market_share_percent,
-    
+    ROUND((mv.total_revenue / SUM(mv.total_revenue) OVER ()) * 100, 2) as revenue_market_share_percent,
+
     -- Ranking
-    RANK() OVER (ORDER BY SUM(fs.order_total_amount) DESC) as revenue_rank,
-    RANK() OVER (ORDER BY COUNT(DISTINCT fs.order_id) DESC) as order_volume_rank
-    
-FROM dimensions.dim_customer dc
-LEFT JOIN facts.fact_sales fs ON dc.customer_key = fs.customer_key
-WHERE dc.is_current = true
-GROUP BY dc.state, dc.city
-HAVING COUNT(DISTINCT fs.order_id) >= 5  -- Only include locations with meaningful activity
-ORDER BY total_revenue DESC;
+    RANK() OVER (ORDER BY mv.total_revenue DESC) as revenue_rank,
+    RANK() OVER (ORDER BY mv.total_orders DESC) as order_volume_rank
+
+FROM analytics.mv_geographic_sales mv
+WHERE mv.total_orders >= 5  -- Only include locations with meaningful activity
+ORDER BY mv.total_revenue DESC;
 
 -- Customer Cohort Analysis
 CREATE OR REPLACE VIEW analytics.customer_cohorts AS
-WITH cohort_data AS (
-    SELECT 
-        dc.customer_id,
-        DATE_TRUNC('month', dc.registration_date) as cohort_month,
-        DATE_TRUNC('month', dd.date_actual) as order_month,
-        DATEDIFF(month, DATE_TRUNC('month', dc.registration_date), DATE_TRUNC('month', dd.date_actual)) as period_number,
-        fs.order_total_amount
-    FROM dimensions.dim_customer dc
-    LEFT JOIN facts.fact_sales fs ON dc.customer_key = fs.customer_key
-    LEFT JOIN dimensions.dim_date dd ON fs.order_date_key = dd.date_key
-    WHERE dc.is_current = true
-)
-SELECT 
-    cohort_month,
-    period_number,
-    COUNT(DISTINCT customer_id) as customers,
-    SUM(order_total_amount) as revenue,
-    AVG(order_total_amount) as avg_order_value,
-    
+SELECT
+    mv.cohort_month,
+    mv.period_number,
+    mv.customers,
+    mv.revenue,
+    mv.avg_order_value,
+
     -- Retention Rate
     ROUND(
-        COUNT(DISTINCT customer_id) * 100.0 / 
-        FIRST_VALUE(COUNT(DISTINCT customer_id)) OVER (
-            PARTITION BY cohort_month 
-            ORDER BY period_number 
+        mv.customers * 100.0 /
+        FIRST_VALUE(mv.customers) OVER (
+            PARTITION BY mv.cohort_month
+            ORDER BY mv.period_number
             ROWS UNBOUNDED PRECEDING
         ), 2
     ) as retention_rate_percent
-    
-FROM cohort_data
-WHERE order_month IS NOT NULL
-GROUP BY cohort_month, period_number
-ORDER BY cohort_month, period_number;
+
+FROM analytics.mv_customer_cohorts mv
+ORDER BY mv.cohort_month, mv.period_number;
@@ -0,0 +1,110 @@
+-- Materialized Views for E-commerce Data Warehouse
+-- Precomputed joins and aggregates behind the analytics views in
+-- business_intelligence_views.sql. Rankings, growth and recency span every
+-- row or depend on CURRENT_DATE, so they stay in the views, which only read
+-- these small aggregated results.
+-- Refreshed by the Redshift loader after each batch, for views whose base
+-- tables changed (see MATERIALIZED_VIEWS in etl/glue_jobs/redshift_loader.py).
+-- COUNT(DISTINCT ...) and the LEFT JOINs rule out incremental refresh, so
+-- each refresh recomputes the view in full.
+-- Only the owner can refresh a materialized view, so run this script as the
+-- database user the loader connects with.
+
+CREATE SCHEMA IF NOT EXISTS analytics;
+
+-- Dependent analytics views are dropped here and recreated by business_intelligence_views.sql
+DROP MATERIALIZED VIEW IF EXISTS analytics.mv_customer_360 CASCADE;
+DROP MATERIALIZED VIEW IF EXISTS analytics.mv_product_performance CASCADE;
+DROP MATERIALIZED VIEW IF EXISTS analytics.mv_geographic_sales CASCADE;
+DROP MATERIALIZED VIEW IF EXISTS analytics.mv_customer_cohorts CASCADE;
+
+-- Order statistics per current customer
+CREATE MATERIALIZED VIEW analytics.mv_customer_360
+DISTSTYLE KEY
+DISTKEY (customer_id)
+SORTKEY (customer_id)
+AS
+SELECT
+    dc.customer_id,
+    dc.full_name,
+    dc.email,
+    dc.customer_segment,
+    dc.city,
+    dc.state,
+    dc.registration_date,
+    COUNT(DISTINCT fs.order_id) as total_orders,
+    SUM(fs.order_total_amount) as lifetime_value,
+    AVG(fs.order_total_amount) as avg_order_value,
+    MIN(dd.date_actual) as first_order_date,
+    MAX(dd.date_actual) as last_order_date,
+    COUNT(DISTINCT fs.product_key) as unique_products_purchased
+FROM dimensions.dim_customer dc
+LEFT JOIN facts.fact_sales fs ON dc.customer_key = fs.customer_key
+LEFT JOIN dimensions.dim_date dd ON fs.order_date_key = dd.date_key
+WHERE dc.is_current = true
+GROUP BY
+    dc.customer_id, dc.full_name, dc.email, dc.customer_segment,
+    dc.city, dc.state, dc.registration_date;
+
+-- Sales and cost per current product
+CREATE MATERIALIZED VIEW analytics.mv_product_performance
+DISTSTYLE ALL
+SORTKEY (product_id)
+AS
+SELECT
+    dp.product_id,
+    dp.product_name,
+    dp.category_name,
+    dp.brand,
+    dp.price,
+    dp.cost,
+    SUM(fs.quantity) as total_units_sold,
+    SUM(fs.line_total) as total_revenue,
+    SUM(fs.quantity * dp.cost) as total_cost,
+    COUNT(DISTINCT fs.order_id) as orders_containing_product,
+    COUNT(DISTINCT fs.customer_key) as unique_customers,
+    AVG(fs.unit_price) as avg_selling_price
+FROM dimensions.dim_product dp
+LEFT JOIN facts.fact_sales fs ON dp.product_key = fs.product_key
+WHERE dp.is_current = true
+GROUP BY
+    dp.product_id, dp.product_name, dp.category_name, dp.brand, dp.price, dp.cost;
+
+-- Customers and sales per city
+CREATE MATERIALIZED VIEW analytics.mv_geographic_sales
+DISTSTYLE ALL
+SORTKEY (state, city)
+AS
+SELECT
+    dc.state,
+    dc.city,
+    COUNT(DISTINCT dc.customer_id) as total_customers,
+    COUNT(DISTINCT CASE WHEN fs.customer_key IS NOT NULL THEN dc.customer_id END) as active_customers,
+    COUNT(DISTINCT fs.order_id) as total_orders,
+    SUM(fs.order_total_amount) as total_revenue,
+    AVG(fs.order_total_amount) as avg_order_value
+FROM dimensions.dim_customer dc
+LEFT JOIN facts.fact_sales fs ON dc.customer_key = fs.customer_key
+WHERE dc.is_current = true
+GROUP BY dc.state, dc.city;
+
+-- Customers and revenue per registration cohort and months since registration
+CREATE MATERIALIZED VIEW analytics.mv_customer_cohorts
+DISTSTYLE ALL
+SORTKEY (cohort_month, period_number)
+AS
+SELECT
+    DATE_TRUNC('month', dc.registration_date) as cohort_month,
+    DATEDIFF(month, DATE_TRUNC('month', dc.registration_date), DATE_TRUNC('month', dd.date_actual)) as period_number,
+    COUNT(DISTINCT dc.customer_id) as customers,
+    SUM(fs.order_total_amount) as revenue,
+    AVG(fs.order_total_amount) as avg_order_value
+FROM dimensions.dim_customer dc
+JOIN facts.fact_sales fs ON dc.customer_key = fs.customer_key
+JOIN dimensions.dim_date dd ON fs.order_date_key = dd.date_key
+WHERE dc.is_current = true
+GROUP BY 1, 2;
+
+-- Grant permissions to ETL role
+GRANT ALL ON SCHEMA analytics TO "ecommerce-dwh-dev-glue-service-role";
+GRANT SELECT ON ALL TABLES IN SCHEMA analytics TO "ecommerce-dwh-dev-glue-service-role";
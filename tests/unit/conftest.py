@@ -0,0 +1,12 @@
+"""
+Shared setup for unit tests
+
+The Glue job modules import each other as top-level modules, the way
+--extra-py-files ships them, so their directory goes on sys.path.
+"""
+
+import os
+import sys
+
+GLUE_JOBS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'etl', 'glue_jobs')
+sys.path.insert(0, os.path.abspath(GLUE_JOBS_DIR))
@@ -0,0 +1,116 @@
+"""
+Unit tests for the dim_date builder
+"""
+
+from datetime import date
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+from date_dimension import COLUMNS, build_date_dimension, missing_ranges
+
+
+def row_for(frame, day):
+    """The dim_date row of one date as a dict"""
+    return frame[frame['date_actual'] == day].iloc[0].to_dict()
+
+
+@pytest.fixture(scope='module')
+def year_2024():
+    return build_date_dimension('2024-01-01', '2024-12-31')
+
+
+def test_columns_follow_table_order(year_2024):
+    assert list(year_2024.columns) == [column for column, _ in COLUMNS]
+    assert len(year_2024) == 366
+
+
+@pytest.mark.parametrize('day, expected', [
+    # Sunday counts as day 1, Saturday as day 7
+    (date(2024, 1, 7), {'date_key': 20240107, 'day_of_week': 1, 'day_of_week_name': 'Sunday', 'is_weekend': True}),
+    (date(2024, 1, 8), {'date_key': 20240108, 'day_of_week': 2, 'day_of_week_name': 'Monday', 'is_weekend': False}),
+    (date(2024, 1, 13), {'date_key': 20240113, 'day_of_week': 7, 'day_of_week_name': 'Saturday', 'is_weekend': True}),
+    (date(2024, 11, 5), {'month_name': 'November', 'month_abbrev': 'Nov', 'quarter_number': 4, 'quarter_name': 'Q4'}),
+])
+def test_calendar_columns(year_2024, day, expected):
+    row = row_for(year_2024, day)
+    assert {column: row[column] for column in expected} == expected
+
+
+@pytest.mark.parametrize('day, fiscal_year, fiscal_quarter, fiscal_month', [
+    (date(2024, 1, 15), 2023, 4, 10),
+    (date(2024, 3, 31), 2023, 4, 12),
+    (date(2024, 4, 1), 2024, 1, 1),
+    (date(2024, 7, 1), 2024, 2, 4),
+    (date(2024, 12, 31), 2024, 3, 9),
+])
+def test_fiscal_year_starts_in_april(year_2024, day, fiscal_year, fiscal_quarter, fiscal_month):
+    row = row_for(year_2024, day)
+    assert (row['fiscal_year'], row['fiscal_quarter'], row['fiscal_month']) == (
+        fiscal_year, fiscal_quarter, fiscal_month
+    )
+
+
+def test_fiscal_year_start_month_is_configurable():
+    frame = build_date_dimension('2024-01-01', '2024-01-31', fiscal_year_start_month=1)
+    row = row_for(frame, date(2024, 1, 15))
+    assert (row['fiscal_year'], row['fiscal_quarter'], row['fiscal_month']) == (2024, 1, 1)
+
+
+@pytest.mark.parametrize('day, is_holiday, holiday_name, is_business_day', [
+    (date(2024, 1, 26), True, 'Republic Day', False),
+    (date(2024, 8, 15), True, 'Independence Day', False),
+    (date(2024, 1, 25), False, None, True),
+    (date(2024, 1, 27), False, None, False),
+])
+def test_fixed_holidays(year_2024, day, is_holiday, holiday_name, is_business_day):
+    row = row_for(year_2024, day)
+    assert row['is_holiday'] == is_holiday
+    assert row['holiday_name'] == holiday_name
+    assert row['is_business_day'] == is_business_day
+
+
+@pytest.mark.parametrize('day, business_day_of_month, business_day_of_year', [
+    (date(2024, 1, 1), 1, 1),
+    (date(2024, 1, 6), 5, 5),
+    (date(2024, 1, 8), 6, 6),
+    # Republic Day keeps the previous count
+    (date(2024, 1, 25), 19, 19),
+    (date(2024, 1, 26), 19, 19),
+    (date(2024, 1, 29), 20, 20),
+    (date(2024, 2, 1), 1, 23),
+    (date(2024, 4, 1), 1, 65),
+])
+def test_business_day_counters(year_2024, day, business_day_of_month, business_day_of_year):
+    row = row_for(year_2024, day)
+    assert row['business_day_of_month'] == business_day_of_month
+    assert row['business_day_of_year'] == business_day_of_year
+
+
+def test_partial_range_counts_from_the_start_of_the_year():
+    frame = build_date_dimension('2024-03-30', '2024-04-02')
+    assert list(frame['date_key']) == [20240330, 20240331, 20240401, 20240402]
+    assert row_for(frame, date(2024, 4, 1))['business_day_of_year'] == 65
+
+
+def test_extra_holidays():
+    frame = build_date_dimension('2024-03-01', '2024-03-31', extra_holidays={'2024-03-25': 'Holi'})
+    row = row_for(frame, date(2024, 3, 25))
+    assert (row['is_holiday'], row['holiday_name'], row['is_business_day']) == (True, 'Holi', False)
+    assert row_for(frame, date(2024, 3, 26))['business_day_of_month'] == 17
+
+
+@pytest.mark.parametrize('existing, required, expected', [
+    ((None, None), ('2024-01-01', '2024-12-31'), [('2024-01-01', '2024-12-31')]),
+    (('2024-01-01', '2025-12-31'), ('2024-06-01', '2025-06-30'), []),
+    (('2024-01-01', '2024-12-31'), ('2024-01-01', '2026-12-31'), [('2025-01-01', '2026-12-31')]),
+    (('2024-01-01', '2024-12-31'), ('2023-07-01', '2024-06-30'), [('2023-07-01', '2023-12-31')]),
+    (
+        ('2024-01-01', '2024-12-31'), ('2023-01-01', '2025-12-31'),
+        [('2023-01-01', '2023-12-31'), ('2025-01-01', '2025-12-31')]
+    ),
+])
+def test_missing_ranges(existing, required, expected):
+    ranges = missing_ranges(*existing, *required)
+    assert ranges == [(pd.Timestamp(start), pd.Timestamp(end)) for start, end in expected]
@@ -0,0 +1,374 @@
+"""
+Unit tests for the Redshift loader's statement builders and plans
+"""
+
+import pytest
+
+from load_planning import (
+    MAINTENANCE_THRESHOLDS,
+    dimension_statements,
+    fact_publish_statements,
+    fact_sales_statements,
+    inferred_member_statement,
+    modified_tables,
+    plan_maintenance,
+    sales_aggregate_statements,
+    scd2_statements,
+    source_load_log_statement,
+    stale_materialized_views,
+)
+
+
+def table_stats(table_name, size_mb=1000, tbl_rows=1000, visible_rows=None, unsorted=0.0, stats_off=0.0):
+    """One recorded svv_table_info row as read_table_stats returns it"""
+    return {
+        'table_name': table_name,
+        'size_mb': size_mb,
+        'tbl_rows': tbl_rows,
+        'estimated_visible_rows': tbl_rows if visible_rows is None else visible_rows,
+        'unsorted': unsorted,
+        'stats_off': stats_off,
+    }
+
+
+@pytest.mark.parametrize('stats, expected', [
+    # Below every threshold
+    (table_stats('facts.fact_sales', unsorted=9.9, stats_off=9.9, visible_rows=901), []),
+    # Stale statistics
+    (
+        table_stats('facts.fact_sales', size_mb=4000, stats_off=10.0),
+        [('ANALYZE', 'stats_off 10.0%', 20.0)]
+    ),
+    # Unsorted wins over deleted rows: SORT ONLY, sized by the unsorted share
+    (
+        table_stats('facts.fact_sales', size_mb=4000, unsorted=25.0, visible_rows=500),
+        [('VACUUM SORT ONLY', 'unsorted 25.0%', 50.0)]
+    ),
+    # Deleted but unreclaimed rows
+    (
+        table_stats('facts.fact_sales', size_mb=4000, tbl_rows=1000, visible_rows=800),
+        [('VACUUM DELETE ONLY', 'deleted 20.0%', 100.0)]
+    ),
+    # Both statistics and a vacuum
+    (
+        table_stats('dimensions.dim_customer', size_mb=400, stats_off=50.0, unsorted=50.0),
+        [('ANALYZE', 'stats_off 50.0%', 2.0), ('VACUUM SORT ONLY', 'unsorted 50.0%', 10.0)]
+    ),
+    # Tiny tables are estimated at one second
+    (
+        table_stats('dimensions.dim_product', size_mb=10, stats_off=80.0),
+        [('ANALYZE', 'stats_off 80.0%', 1.0)]
+    ),
+    # Empty tables never divide by zero
+    (table_stats('facts.fact_inventory', size_mb=0, tbl_rows=0, visible_rows=0), []),
+])
+def test_plan_maintenance_thresholds(stats, expected):
+    plan = plan_maintenance([stats], budget_seconds=3600)
+    assert [(a['action'], a['reason'], a['estimated_seconds']) for a in plan] == expected
+    assert all(a['status'] == 'planned' and a['table_name'] == stats['table_name'] for a in plan)
+
+
+def test_plan_maintenance_orders_analyze_first_then_largest_vacuum():
+    plan = plan_maintenance([
+        table_stats('facts.fact_web_events', size_mb=4000, tbl_rows=1000, visible_rows=750),
+        table_stats('facts.fact_sales', size_mb=20000, unsorted=50.0),
+        table_stats('dimensions.dim_customer', size_mb=2000, stats_off=20.0),
+    ], budget_seconds=3600)
+    assert [(a['table_name'], a['action']) for a in plan] == [
+        ('dimensions.dim_customer', 'ANALYZE'),
+        ('facts.fact_sales', 'VACUUM SORT ONLY'),
+        ('facts.fact_web_events', 'VACUUM DELETE ONLY'),
+    ]
+
+
+@pytest.mark.parametrize('budget_seconds, expected_status', [
+    (3600, ['planned', 'planned', 'planned']),
+    # The 500s sort does not fit after ANALYZE; the smaller 100s vacuum still does
+    (200, ['planned', 'deferred', 'planned']),
+    (50, ['planned', 'deferred', 'deferred']),
+    (5, ['deferred', 'deferred', 'deferred']),
+])
+def test_plan_maintenance_defers_what_does_not_fit_the_budget(budget_seconds, expected_status):
+    plan = plan_maintenance([
+        table_stats('facts.fact_sales', size_mb=20000, unsorted=50.0),
+        table_stats('facts.fact_web_events', size_mb=4000, tbl_rows=1000, visible_rows=750),
+        table_stats('dimensions.dim_customer', size_mb=2000, stats_off=20.0),
+    ], budget_seconds=budget_seconds)
+    assert [a['estimated_seconds'] for a in plan] == [10.0, 500.0, 100.0]
+    assert [a['status'] for a in plan] == expected_status
+
+
+def test_plan_maintenance_custom_thresholds():
+    stats = [table_stats('facts.fact_sales', unsorted=5.0)]
+    assert plan_maintenance(stats, 3600) == []
+    thresholds = dict(MAINTENANCE_THRESHOLDS, unsorted=5.0)
+    assert [a['action'] for a in plan_maintenance(stats, 3600, thresholds)] == ['VACUUM SORT ONLY']
+
+
+def flat(statement):
+    """A statement on one line, for comparing its text"""
+    return ' '.join(statement.split())
+
+
+@pytest.mark.parametrize('dimension, trailing_updates', [
+    ('dim_customer', ['UPDATE dimensions.dim_customer SET age']),
+    ('dim_product', ['UPDATE dimensions.dim_product SET stock_quantity']),
+])
+def test_scd2_statements_shape(dimension, trailing_updates):
+    statements = [flat(s) for s in scd2_statements(dimension, '2024-01-01 00:00:00', 'test_batch')]
+    prefixes = [
+        f"DROP TABLE IF EXISTS scd_{dimension}_src",
+        f"CREATE TEMP TABLE scd_{dimension}_src",
+        f"DROP TABLE IF EXISTS scd_{dimension}_changes",
+        f"CREATE TEMP TABLE scd_{dimension}_changes",
+        f"UPDATE dimensions.{dimension} SET expiry_date",
+        f"INSERT INTO dimensions.{dimension} (",
+        "INSERT INTO etl_control.inferred_member_log",
+        f"UPDATE dimensions.{dimension} SET",
+    ] + trailing_updates
+    assert len(statements) == len(prefixes)
+    assert all(s.startswith(p) for s, p in zip(statements, prefixes))
+
+
+def test_scd2_changes_compare_row_hashes():
+    changes = flat(scd2_statements('dim_product', '2024-01-01 00:00:00', 'test_batch')[3])
+    assert 'd.row_hash <> s.row_hash' in changes
+    assert 'd.product_id IS NULL' in changes
+
+
+def hash_input(dimension, boolean_columns=()):
+    """The expression a dimension's row_hash is computed over"""
+    source = scd2_statements(dimension, '2024-01-01 00:00:00', 'test_batch', boolean_columns)[1]
+    return source.split('MD5(')[1].split(') AS row_hash')[0]
+
+
+@pytest.mark.parametrize('dimension, text_column', [('dim_customer', 'email'), ('dim_product', 'brand')])
+def test_scd2_hash_spells_out_booleans_and_nulls(dimension, text_column):
+    hashed = hash_input(dimension, {'is_active'})
+    assert "CASE WHEN is_active THEN 't' WHEN NOT is_active THEN 'f' END" in hashed
+    assert "CAST(is_active AS VARCHAR)" not in hashed
+    assert f"COALESCE(CAST({text_column} AS VARCHAR), '<NULL>')" in hashed
+    assert ", '')" not in hashed
+
+
+@pytest.mark.parametrize('dimension, unversioned', [
+    ('dim_customer', ['age', 'customer_lifetime_months']),
+    ('dim_product', ['stock_quantity', 'stock_status']),
+])
+def test_scd2_hash_leaves_out_unversioned_columns(dimension, unversioned):
+    hashed = hash_input(dimension)
+    assert not [column for column in unversioned if column in hashed]
+
+
+def test_refreshed_customer_columns_follow_the_calendar():
+    refresh = flat(scd2_statements('dim_customer', '2024-01-01 00:00:00', 'test_batch')[-1])
+    assert 'age = FLOOR(DATEDIFF(day, date_of_birth, CURRENT_DATE) / 365.25)' in refresh
+    assert 'customer_lifetime_months = FLOOR(DATEDIFF(day, registration_date, CURRENT_DATE) / 30)' in refresh
+    assert 'WHERE is_current = true' in refresh
+
+
+def test_scd2_expire_and_insert_skip_inferred_members():
+    statements = scd2_statements('dim_customer', '2024-01-01 00:00:00', 'test_batch')
+    expire, insert, log, enrich = (flat(s) for s in statements[4:8])
+    assert 'AND NOT c.enriches_inferred' in expire
+    assert 'WHERE NOT enriches_inferred' in insert
+    assert "SELECT 'test_batch', 'dim_customer', dimensions.dim_customer.customer_key" in log
+    assert 'AND c.enriches_inferred' in log
+    assert 'is_inferred = false' in enrich and 'AND c.enriches_inferred' in enrich
+
+
+@pytest.mark.parametrize('dimension, expected', [
+    (
+        'dim_customer',
+        "INSERT INTO dimensions.dim_customer ( customer_id, effective_date, is_current, is_inferred ) "
+        "SELECT s.customer_id, '2024-01-01 00:00:00'::timestamp, true, true FROM staging.stg_orders s"
+    ),
+    (
+        'dim_product',
+        "INSERT INTO dimensions.dim_product ( product_id, product_name, sku, effective_date, is_current, "
+        "is_inferred ) SELECT s.product_id, MAX(product_name), MAX(sku), '2024-01-01 00:00:00'::timestamp, "
+        "true, true FROM staging.stg_order_items s"
+    ),
+])
+def test_inferred_members_come_from_the_fact_source(dimension, expected):
+    statement = flat(inferred_member_statement(dimension, '2024-01-01 00:00:00'))
+    assert statement.startswith(expected)
+    assert 'AND d.is_current = true' in statement
+    assert statement.endswith(f"GROUP BY s.{dimension[4:]}_id;")
+
+
+def test_inferred_members_follow_every_dimension_load():
+    statements = [flat(s) for s in dimension_statements('2024-01-01 00:00:00', 'test_batch')]
+    inferred = [i for i, s in enumerate(statements) if 'is_inferred ) SELECT' in s]
+    assert inferred == [len(statements) - 2, len(statements) - 1]
+
+
+# Materialized views with a two-level dependency chain
+DEPENDENT_VIEWS = {
+    'analytics.mv_sales_base': {'base_tables': ['facts.fact_sales'], 'depends_on': []},
+    'analytics.mv_customer_base': {'base_tables': ['dimensions.dim_customer'], 'depends_on': []},
+    'analytics.mv_customer_sales': {
+        'base_tables': [], 'depends_on': ['analytics.mv_sales_base', 'analytics.mv_customer_base']
+    },
+    'analytics.mv_customer_rollup': {'base_tables': [], 'depends_on': ['analytics.mv_customer_sales']},
+}
+
+
+@pytest.mark.parametrize('changed_tables, expected', [
+    (set(), []),
+    ({'facts.fact_web_events'}, []),
+    (
+        {'facts.fact_sales'},
+        ['analytics.mv_sales_base', 'analytics.mv_customer_sales', 'analytics.mv_customer_rollup']
+    ),
+])
+def test_stale_materialized_views_follow_dependencies(changed_tables, expected):
+    assert stale_materialized_views(changed_tables, DEPENDENT_VIEWS) == expected
+
+
+def test_stale_materialized_views_refresh_after_every_dependency():
+    order = stale_materialized_views({'facts.fact_sales', 'dimensions.dim_customer'}, DEPENDENT_VIEWS)
+    assert set(order) == set(DEPENDENT_VIEWS)
+    for name, config in DEPENDENT_VIEWS.items():
+        assert all(order.index(dependency) < order.index(name) for dependency in config['depends_on'])
+
+
+def test_modified_tables():
+    assert modified_tables([
+        {'statement': 'INSERT INTO facts.fact_sales ( order_date_key', 'rows_affected': 10},
+        {'statement': 'DELETE FROM facts.fact_sales_daily WHERE', 'rows_affected': 0},
+        {'statement': 'ALTER TABLE facts.fact_sales APPEND FROM staging.shadow_fact_sales', 'rows_affected': -1},
+        {'statement': 'COPY dimensions.dim_date FROM', 'rows_affected': -1},
+        {'statement': 'CREATE TEMP TABLE scd_dim_customer_src AS', 'rows_affected': 100},
+    ]) == {'facts.fact_sales', 'dimensions.dim_date'}
+
+
+def test_source_load_log_records_only_tables_with_new_rows():
+    statement = flat(source_load_log_statement({
+        'orders': (None, '2024-01-02 03:00:00'),
+        'customers': ('2024-01-01 03:00:00', '2024-01-02 03:00:00'),
+        'products': ('2024-01-01 03:00:00', '2024-01-01 03:00:00'),
+        'order_items': (None, None),
+    }, 'test_batch'))
+    assert statement == (
+        "INSERT INTO etl_control.source_load_log (table_name, etl_batch_id, processed_through) VALUES "
+        "('customers', 'test_batch', '2024-01-02 03:00:00'), ('orders', 'test_batch', '2024-01-02 03:00:00');"
+    )
+
+
+def test_source_load_log_skips_batches_without_new_rows():
+    assert source_load_log_statement({'orders': ('2024-01-01 03:00:00', '2024-01-01 03:00:00')}, 'b') is None
+
+
+def test_append_inserts_only_rows_missing_from_the_window():
+    statements = [flat(s) for s in fact_sales_statements('append', 20240101, 20240131, 'b', 'raw')]
+    assert len(statements) == 1
+    assert statements[0].startswith('INSERT INTO facts.fact_sales (')
+    assert 'NOT EXISTS ( SELECT 1 FROM facts.fact_sales fs WHERE fs.order_date_key BETWEEN 20240101 AND 20240131' in (
+        statements[0]
+    )
+
+
+def test_restate_deletes_the_staged_orders_in_the_window_first():
+    delete, insert = [flat(s) for s in fact_sales_statements('restate', 20240101, 20240131, 'b', 'raw')]
+    assert delete == (
+        "DELETE FROM facts.fact_sales WHERE order_date_key BETWEEN 20240101 AND 20240131 "
+        "AND order_id IN (SELECT order_id FROM staging.stg_orders);"
+    )
+    assert 'NOT EXISTS' not in insert
+
+
+@pytest.mark.parametrize('source_layer, expected', [
+    ('raw', 'dd.year_number as order_year'),
+    ('processed', 'o.order_year'),
+])
+def test_derived_order_columns_follow_the_source_layer(source_layer, expected):
+    insert = flat(fact_sales_statements('append', 20240101, 20240131, 'b', source_layer)[-1])
+    assert f"{expected}," in insert
+    assert "'b' as etl_batch_id" in insert
+
+
+def test_fact_rows_can_go_to_a_shadow_table():
+    insert = flat(fact_sales_statements('append', 20240101, 20240131, 'b', 'raw', target='staging.shadow')[-1])
+    assert insert.startswith('INSERT INTO staging.shadow (')
+    # Existing rows are still looked up in fact_sales itself
+    assert 'SELECT 1 FROM facts.fact_sales fs' in insert
+
+
+def test_sales_aggregates_rebuild_the_window_days_and_whole_months():
+    statements = [flat(s) for s in sales_aggregate_statements('b', 20240115, 20240203)]
+    prefixes = [
+        'DROP TABLE IF EXISTS sales_aggregate_enriched_days',
+        'CREATE TEMP TABLE sales_aggregate_enriched_days',
+        'DELETE FROM facts.fact_sales_daily',
+        'INSERT INTO facts.fact_sales_daily',
+        'DELETE FROM facts.fact_sales_monthly',
+        'INSERT INTO facts.fact_sales_monthly',
+    ]
+    assert len(statements) == len(prefixes)
+    assert all(s.startswith(p) for s, p in zip(statements, prefixes))
+    assert "l.etl_batch_id = 'b'" in statements[1]
+    assert statements[2] == (
+        'DELETE FROM facts.fact_sales_daily WHERE (order_date_key BETWEEN 20240115 AND 20240203 OR '
+        'order_date_key IN (SELECT order_date_key FROM sales_aggregate_enriched_days));'
+    )
+    # Monthly rows cover the whole of January and February
+    assert 'DELETE FROM facts.fact_sales_monthly WHERE (month_key BETWEEN 202401 AND 202402 OR' in statements[4]
+    assert 'WHERE (fs.order_date_key BETWEEN 20240101 AND 20240231 OR' in statements[5]
+
+
+def test_sales_aggregates_without_a_window_rebuild_only_enriched_days():
+    statements = [flat(s) for s in sales_aggregate_statements('b')]
+    assert statements[2] == (
+        'DELETE FROM facts.fact_sales_daily WHERE '
+        'order_date_key IN (SELECT order_date_key FROM sales_aggregate_enriched_days);'
+    )
+    assert 'BETWEEN' not in ' '.join(statements)
+
+
+def test_daily_sales_keep_distinct_count_sketches():
+    daily = flat(sales_aggregate_statements('b', 20240101, 20240131)[3])
+    assert 'HLL_CREATE_SKETCH(fs.customer_key), HLL_CREATE_SKETCH(fs.order_id)' in daily
+
+
+def statement_kinds(statements):
+    """The first three words of each statement"""
+    return [' '.join(flat(s).split()[:3]) for s in statements]
+
+
+def test_transaction_publish_runs_facts_summaries_and_log_together():
+    in_transaction, after_append = fact_publish_statements('transaction', 'restate', 20240101, 20240131, 'b', 'raw')
+    assert after_append == []
+    assert statement_kinds(in_transaction) == [
+        'DELETE FROM facts.fact_sales',
+        'INSERT INTO facts.fact_sales',
+        'DROP TABLE IF',
+        'CREATE TEMP TABLE',
+        'DELETE FROM facts.fact_sales_daily',
+        'INSERT INTO facts.fact_sales_daily',
+        'DELETE FROM facts.fact_sales_monthly',
+        'INSERT INTO facts.fact_sales_monthly',
+        'INSERT INTO etl_control.fact_load_log',
+    ]
+
+
+def test_append_publish_builds_the_shadow_and_follows_the_append():
+    in_transaction, after_append = fact_publish_statements('append', 'append', 20240101, 20240131, 'b', 'raw')
+    assert [flat(s) for s in in_transaction[:5]] == [
+        'DROP TABLE IF EXISTS staging.shadow_fact_sales;',
+        'CREATE TABLE staging.shadow_fact_sales (LIKE facts.fact_sales);',
+        'ALTER TABLE staging.shadow_fact_sales DROP COLUMN sales_key;',
+        'ALTER TABLE staging.shadow_fact_sales DROP COLUMN created_at;',
+        'ALTER TABLE staging.shadow_fact_sales DROP COLUMN updated_at;',
+    ]
+    assert statement_kinds(in_transaction[5:]) == ['INSERT INTO staging.shadow_fact_sales']
+    # Summaries and the log row read fact_sales, so they wait for the APPEND
+    assert statement_kinds(after_append)[-2:] == ['INSERT INTO etl_control.fact_load_log', 'DROP TABLE IF']
+    assert flat(after_append[-1]) == 'DROP TABLE IF EXISTS staging.shadow_fact_sales;'
+    assert 'DELETE FROM facts.fact_sales_daily' in statement_kinds(after_append)
+
+
+def test_publish_without_facts_still_rebuilds_enriched_summaries():
+    in_transaction, after_append = fact_publish_statements('append', 'append', None, None, 'b', 'raw')
+    assert after_append == []
+    assert [flat(s) for s in in_transaction] == [flat(s) for s in sales_aggregate_statements('b')]
@@ -0,0 +1,148 @@
+"""
+Unit tests for the Redshift connection pool, against a fake psycopg2 pool
+"""
+
+import threading
+
+import pytest
+
+pytest.importorskip('psycopg2')
+
+import redshift_connection
+from redshift_connection import RedshiftConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, params=None):
+        if sql.startswith('FAIL'):
+            raise RuntimeError(sql)
+        self.connection.executed.append(sql)
+        self.rowcount = 1
+
+
+class FakeConnection:
+    def __init__(self):
+        self.autocommit = None
+        self.closed = 0
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakeThreadedConnectionPool:
+    """Stands in for psycopg2's pool, which raises instead of waiting when exhausted"""
+
+    def __init__(self, minconn, maxconn, dsn=None, **kwargs):
+        self.maxconn = maxconn
+        self.in_use = []
+        self.returned = []
+        self.lock = threading.Lock()
+
+    def getconn(self):
+        with self.lock:
+            if len(self.in_use) >= self.maxconn:
+                raise RuntimeError('connection pool exhausted')
+            conn = FakeConnection()
+            self.in_use.append(conn)
+            return conn
+
+    def putconn(self, conn, close=False):
+        with self.lock:
+            self.in_use.remove(conn)
+            self.returned.append((conn, close))
+
+    def closeall(self):
+        pass
+
+
+@pytest.fixture
+def connection_pool(monkeypatch):
+    monkeypatch.setattr(redshift_connection.pool, 'ThreadedConnectionPool', FakeThreadedConnectionPool)
+    return RedshiftConnectionPool('dbname=test', max_connections=2)
+
+
+def test_connection_is_released_when_the_block_raises(connection_pool):
+    with pytest.raises(ValueError):
+        with connection_pool.connection():
+            raise ValueError('boom')
+    assert connection_pool._pool.in_use == []
+    assert len(connection_pool._pool.returned) == 1
+    # Both slots are free again
+    with connection_pool.connection(), connection_pool.connection():
+        pass
+
+
+def test_closed_connections_are_discarded(connection_pool):
+    with connection_pool.connection() as conn:
+        conn.closed = 1
+    assert connection_pool._pool.returned == [(conn, True)]
+
+
+def test_execute_commits_a_transaction(connection_pool):
+    results = connection_pool.execute(['INSERT INTO facts.fact_sales SELECT 1', 'DELETE FROM staging.stg_orders'])
+    conn, _ = connection_pool._pool.returned[0]
+    assert conn.autocommit is False
+    assert conn.commits == 1
+    assert [r['rows_affected'] for r in results] == [1, 1]
+
+
+def test_execute_rolls_back_a_failed_transaction(connection_pool):
+    with pytest.raises(RuntimeError):
+        connection_pool.execute(['INSERT INTO facts.fact_sales SELECT 1', 'FAIL'])
+    conn, _ = connection_pool._pool.returned[0]
+    assert (conn.commits, conn.rollbacks) == (0, 1)
+    assert connection_pool._pool.in_use == []
+
+
+def test_execute_without_transaction_autocommits(connection_pool):
+    connection_pool.execute(['VACUUM SORT ONLY facts.fact_sales;'], transaction=False)
+    conn, _ = connection_pool._pool.returned[0]
+    assert conn.autocommit is True
+    assert (conn.commits, conn.rollbacks) == (0, 0)
+
+
+def test_callers_wait_for_a_free_connection(connection_pool):
+    borrowed = threading.Event()
+    release = threading.Event()
+    finished = threading.Event()
+
+    def hold():
+        with connection_pool.connection():
+            borrowed.set()
+            release.wait(5)
+
+    holders = [threading.Thread(target=hold) for _ in range(2)]
+    for holder in holders:
+        holder.start()
+    while len(connection_pool._pool.in_use) < 2:
+        borrowed.wait(0.01)
+
+    # A third caller blocks on the semaphore instead of exhausting the pool
+    waiter = threading.Thread(target=lambda: (connection_pool.execute(['SELECT 1']), finished.set()))
+    waiter.start()
+    assert not finished.wait(0.2)
+
+    release.set()
+    for thread in holders + [waiter]:
+        thread.join(5)
+    assert finished.is_set()
+    assert connection_pool._pool.in_use == []
@@ -0,0 +1,43 @@
+"""
+Unit tests for the incremental processing watermark store, against a local file
+"""
+
+import json
+
+import pytest
+
+pytest.importorskip('boto3')
+
+from watermark_store import WatermarkStore
+
+
+@pytest.fixture
+def location(tmp_path):
+    return str(tmp_path / 'watermarks.json')
+
+
+def test_first_run_has_no_watermarks(location):
+    assert WatermarkStore(location).load() == {}
+
+
+def test_saved_watermarks_load_back(location):
+    watermarks = {'orders': '2024-01-02T03:04:05', 'web_events': '2024-01-02T00:00:00'}
+    WatermarkStore(location).save(watermarks)
+    assert WatermarkStore(location).load() == watermarks
+
+
+def test_save_replaces_the_whole_document(location, tmp_path):
+    store = WatermarkStore(location)
+    store.save({'orders': '2024-01-01T00:00:00', 'customers': '2024-01-01T00:00:00'})
+    store.save({'orders': '2024-01-02T00:00:00'})
+    with open(location) as f:
+        assert json.load(f) == {'orders': '2024-01-02T00:00:00'}
+    # The temporary file was moved into place, not left behind
+    assert [p.name for p in tmp_path.iterdir()] == ['watermarks.json']
+
+
+def test_unreadable_document_raises(location):
+    with open(location, 'w') as f:
+        f.write('{not json')
+    with pytest.raises(json.JSONDecodeError):
+        WatermarkStore(location).load()